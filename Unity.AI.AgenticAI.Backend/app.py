@@ -1,34 +1,110 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from config import Config
+from quart import Quart, request, jsonify
+from quart.json.provider import JSONProvider
+from quart_cors import cors
+from config import get_config
 from models import AgenticRequest, AgenticResponse
 from self_consistency import SelfConsistencyEngine
-from cot_engine import ChainOfThoughtEngine
-from pydantic import ValidationError
-from pdf_extractor import extract_text_from_pdf, get_pdf_info
+from semantic_cache import SemanticCache
+from pydantic import BaseModel, ValidationError
+from pdf_extractor import extract_text_from_pdf
+import asyncio
+import functools
+import logging
+import orjson
+import os
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+config = get_config()
+
+
+def _orjson_default(obj):
+    """Serialize types orjson does not handle natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider that uses orjson for jsonify and request parsing"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_orjson_default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round-trip in dumps()
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_orjson_default), mimetype="application/json")
+
+
+# Pipeline debug logging only in debug mode; production runs at INFO
+logging.basicConfig(level=logging.INFO)
+if config.FLASK_DEBUG:
+    logging.getLogger("self_consistency").setLevel(logging.DEBUG)
+
+app = Quart(__name__)
+app.json = OrjsonProvider(app)
+app = cors(app)  # Enable CORS for all routes
 
 # Validate configuration on startup
 try:
-    Config.validate()
+    config.validate()
 except ValueError as e:
     print(f"Configuration error: {e}")
     print("Please set OPENAI_API_KEY in your .env file")
     exit(1)
 
 
+@app.before_serving
+async def _configure_executor():
+    """Size the default thread pool used by asyncio.to_thread (PDF parsing)"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+    )
+
+
+# Responses for near-identical earlier requests, shared across requests
+semantic_cache = SemanticCache() if config.SEMANTIC_CACHE_ENABLED else None
+
+
+# Self-consistency engines are reused across requests so their LLM clients
+# (and HTTP connection pools) survive between calls
+@functools.lru_cache(maxsize=32)
+def _build_sc_engine(provider: str, model_name: str, temperature: float, max_concurrency: int) -> SelfConsistencyEngine:
+    """Build the self-consistency engine for a provider, model and temperature"""
+    return SelfConsistencyEngine(
+        model_name=model_name,
+        temperature=temperature,
+        max_concurrency=max_concurrency
+    )
+
+
+def get_sc_engine(model_name: str, temperature: float, max_concurrency: int) -> SelfConsistencyEngine:
+    """Get the shared self-consistency engine for a model and temperature"""
+    return _build_sc_engine(config.OPENAI_PROVIDER, model_name, temperature, max_concurrency)
+
+
 def get_model_name(model_type: str) -> str:
     """Get the actual model name based on fast/slow selection"""
     if model_type == "slow":
-        return Config.SLOW_MODEL
+        return config.SLOW_MODEL
+    else:
+        return config.FAST_MODEL
+
+
+def get_max_concurrency(model_type: str) -> int:
+    """Get the concurrent LLM request limit based on fast/slow selection"""
+    if model_type == "slow":
+        return config.SLOW_MODEL_MAX_CONCURRENCY
     else:
-        return Config.FAST_MODEL
+        return config.MAX_CONCURRENCY
 
 
-def parse_request_data():
+async def parse_request_data():
     """
     Parse request data from either JSON or multipart/form-data
 
@@ -40,25 +116,30 @@ def parse_request_data():
 
     # Check if this is a multipart/form-data request (PDF upload)
     if request.content_type and 'multipart/form-data' in request.content_type:
-        pdf_file = request.files.get('pdf_file')
+        files = await request.files
+        form = await request.form
+        pdf_file = files.get('pdf_file')
 
         # Extract text from PDF if provided
         if pdf_file and pdf_file.filename:
             try:
-                pdf_text = extract_text_from_pdf(pdf_file)
-                pdf_file.stream.seek(0)
-                pdf_info = get_pdf_info(pdf_file)
+                # Parse in a worker thread so the event loop keeps serving other requests
+                pdf_text, pdf_info = await asyncio.to_thread(extract_text_from_pdf, pdf_file.read())
             except ValueError as e:
                 raise ValueError(f"PDF extraction failed: {str(e)}")
 
         # Get other form fields
         data = {
-            "prompt": request.form.get('prompt', ''),
-            "system_prompt": request.form.get('system_prompt'),
-            "num_self_consistency": int(request.form.get('num_self_consistency', 5)),
-            "num_cot": int(request.form.get('num_cot', 3)),
-            "model": request.form.get('model', 'fast'),
-            "temperature": float(request.form.get('temperature', 0.7))
+            "prompt": form.get('prompt', ''),
+            "system_prompt": form.get('system_prompt'),
+            "num_self_consistency": int(form.get('num_self_consistency', 5)),
+            "num_cot": int(form.get('num_cot', 3)),
+            "model": form.get('model', 'fast'),
+            "temperature": float(form.get('temperature', 0.7)),
+            "mode": form.get('mode', 'sync'),
+            "early_stop_threshold": form.get('early_stop_threshold'),
+            "cache": form.get('cache', 'false').lower() == "true",
+            "no_cache": form.get('no_cache', 'false').lower() == "true"
         }
 
         # Combine PDF text with prompt if PDF was provided
@@ -66,7 +147,7 @@ def parse_request_data():
             data["prompt"] = _combine_pdf_with_prompt(pdf_text, data.get("prompt", ""))
     else:
         # Handle JSON request
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
             raise ValueError("Request body must be JSON or form-data")
 
@@ -80,6 +161,22 @@ def _combine_pdf_with_prompt(pdf_text: str, original_prompt: str) -> str:
     return f"PDF Content:\n{pdf_text}\n\nQuestion: Please analyze this document."
 
 
+# Azure OpenAI pricing (CAD per 1M tokens): (input_price, output_price, pricing_model).
+# Matched by substring in insertion order, so more specific names come first.
+PRICING = {
+    "gpt-4o-mini": (0.20844, 0.8338, "GPT-4o-mini-0718 Global"),
+    "gpt-4o": (4.20339, 16.8136, "GPT-4o-2024-1120 Regional"),
+}
+DEFAULT_PRICING = (0.20844, 0.8338, "GPT-4o-mini-0718 Global (default)")
+
+
+@functools.lru_cache(maxsize=16)
+def _match_pricing(model_name: str) -> tuple[float, float, str]:
+    """Find the pricing entry for a model name (defaults to gpt-4o-mini pricing)"""
+    name_lower = model_name.lower()
+    return next((pricing for key, pricing in PRICING.items() if key in name_lower), DEFAULT_PRICING)
+
+
 def calculate_cost(token_usage: dict, model_name: str) -> dict:
     """
     Calculate cost based on token usage and model
@@ -91,22 +188,7 @@ def calculate_cost(token_usage: dict, model_name: str) -> dict:
     Returns:
         Dictionary with cost breakdown
     """
-    # Azure OpenAI pricing (per 1M tokens)
-    if 'gpt-4o-mini' in model_name.lower():
-        # GPT-4o-mini-0718 Global
-        input_price = 0.20844
-        output_price = 0.8338
-        pricing_model = "GPT-4o-mini-0718 Global"
-    elif 'gpt-4o' in model_name.lower():
-        # GPT-4o-2024-1120 Regional
-        input_price = 4.20339
-        output_price = 16.8136
-        pricing_model = "GPT-4o-2024-1120 Regional"
-    else:
-        # Default to gpt-4o-mini pricing
-        input_price = 0.20844
-        output_price = 0.8338
-        pricing_model = "GPT-4o-mini-0718 Global (default)"
+    input_price, output_price, pricing_model = _match_pricing(model_name)
 
     prompt_tokens = token_usage.get('prompt_tokens', 0)
     completion_tokens = token_usage.get('completion_tokens', 0)
@@ -126,8 +208,22 @@ def calculate_cost(token_usage: dict, model_name: str) -> dict:
     }
 
 
+def _completion_response(response: AgenticResponse):
+    """
+    Serialize a completion with pydantic directly
+
+    pdf_info is omitted when no PDF was sent; with ?compact=1 every field
+    still at its default (e.g. zero confidences, empty reasoning) is dropped too.
+    """
+    compact = request.args.get("compact") == "1"
+    return app.response_class(
+        response.model_dump_json(exclude_none=True, exclude_defaults=compact),
+        mimetype="application/json"
+    )
+
+
 @app.route("/")
-def home():
+async def home():
     """Health check endpoint"""
     return jsonify({
         "status": "running",
@@ -137,7 +233,7 @@ def home():
 
 
 @app.route("/v1/completions", methods=["POST"])
-def completions():
+async def completions():
     """
     OpenAI-compatible endpoint for agentic completions with CoT and self-consistency
 
@@ -150,7 +246,11 @@ def completions():
         "num_self_consistency": 5,
         "num_cot": 3,
         "model": "fast",
-        "temperature": 0.7
+        "temperature": 0.7,
+        "mode": "sync",
+        "early_stop_threshold": 0.8 (optional),
+        "cache": false,
+        "no_cache": false
     }
 
     2. Form-data with optional PDF (multipart/form-data):
@@ -161,14 +261,21 @@ def completions():
     - num_cot: number (default: 3)
     - model: text (default: "fast")
     - temperature: number (default: 0.7)
+    - mode: text (default: "sync"; "batch" uses the OpenAI Batch API)
+    - early_stop_threshold: number (optional, 0-1)
+    - cache: boolean (default: false)
+    - no_cache: boolean (default: false)
+
+    Query parameters:
+    - compact=1: omit fields that are at their default value
     """
     try:
         # Parse request data
-        data, pdf_info = parse_request_data()
+        data, pdf_info = await parse_request_data()
 
         # Validate request
         try:
-            req = AgenticRequest(**data)
+            req = AgenticRequest.model_validate(data)
         except ValidationError as e:
             return jsonify({"error": "Invalid request", "details": e.errors()}), 400
     except ValueError as e:
@@ -181,21 +288,46 @@ def completions():
         # Get model name
         model_name = get_model_name(req.model)
 
-        # Initialize self-consistency engine
-        sc_engine = SelfConsistencyEngine(
-            model_name=model_name,
-            temperature=req.temperature
+        # Serve near-identical earlier requests from the semantic cache, under the same
+        # rules as the result cache: deterministic runs, or sampled runs with cache=true
+        use_cache = (
+            semantic_cache is not None
+            and not req.no_cache
+            and (req.temperature == 0 or req.cache)
         )
+        if use_cache:
+            start_time = time.time()
+            cache_params = (req.system_prompt, model_name, req.temperature, req.mode, req.num_self_consistency, req.num_cot, req.early_stop_threshold)
+            prompt_vector = await semantic_cache.aembed(req.prompt)
+            cached_response = semantic_cache.lookup(prompt_vector, cache_params)
+            if cached_response is not None:
+                # Nothing was spent on this request: report zero usage and cost, and mark it cached
+                token_usage = dict.fromkeys(cached_response.token_usage, 0)
+                response = cached_response.model_copy(update={
+                    "prompt": req.prompt,
+                    "pdf_info": pdf_info,
+                    "token_usage": token_usage,
+                    "cost_analysis": calculate_cost(token_usage, model_name),
+                    "timing": {"total_time": round(time.time() - start_time, 3), "unit": "seconds", "cached": True}
+                })
+                return _completion_response(response), 200
+
+        # Get the shared self-consistency engine
+        sc_engine = get_sc_engine(model_name, req.temperature, get_max_concurrency(req.model))
 
         # Run self-consistency with chain-of-thought and reflection
-        (samples, preliminary_answer, final_answer, reflection_reasoning,
-         weighted_confidence, llm_confidence, agreement_confidence,
-         reflection_confidence, summary, token_usage, timing) = sc_engine.run_self_consistency(
+        result = await sc_engine.run_self_consistency_async(
             prompt=req.prompt,
             num_samples=req.num_self_consistency,
             num_cot_steps=req.num_cot,
-            system_prompt=req.system_prompt
+            system_prompt=req.system_prompt,
+            mode=req.mode,
+            early_stop_threshold=req.early_stop_threshold,
+            cache=False if req.no_cache else (True if req.cache else None)
         )
+        (samples, preliminary_answer, final_answer, reflection_reasoning,
+         weighted_confidence, llm_confidence, agreement_confidence,
+         reflection_confidence, summary, token_usage, timing, stopped_early) = result
 
         # Get the primary chain-of-thought (from the first sample for consistency)
         primary_cot = samples[0].reasoning_path if samples else []
@@ -219,15 +351,16 @@ def completions():
             reasoning_summary=summary,
             token_usage=token_usage,
             cost_analysis=cost_analysis,
-            timing=timing
+            timing=timing,
+            stopped_early=stopped_early,
+            pdf_info=pdf_info
         )
 
-        # Convert to dict and add PDF info if present
-        response_dict = response.model_dump()
-        if pdf_info:
-            response_dict['pdf_info'] = pdf_info
+        # Failed or fallback runs are not worth replaying to similar prompts
+        if use_cache and not sc_engine.is_degraded(result):
+            semantic_cache.add(prompt_vector, cache_params, response)
 
-        return jsonify(response_dict), 200
+        return _completion_response(response), 200
 
     except Exception as e:
         app.logger.error(f"Error processing request: {str(e)}")
@@ -237,13 +370,3 @@ def completions():
             "message": str(e)
         }), 500
 
-
-if __name__ == "__main__":
-    print(f"Starting Agentic AI API on port {Config.FLASK_PORT}")
-    print(f"Fast model: {Config.FAST_MODEL}")
-    print(f"Slow model: {Config.SLOW_MODEL}")
-    app.run(
-        host="0.0.0.0",
-        port=Config.FLASK_PORT,
-        debug=Config.FLASK_DEBUG
-    )
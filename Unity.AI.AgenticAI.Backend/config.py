@@ -1,48 +1,107 @@
+import functools
 import os
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
+from typing import Optional
 
 load_dotenv()
 
 
+def _as_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+def _env(name: str, default, cast=str):
+    """Dataclass field read from the environment variable `name` when the config is loaded"""
+    def read():
+        value = os.getenv(name)
+        return default if value is None else cast(value)
+    return field(default_factory=read)
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration class for the Agentic AI API"""
+    """Configuration for the Agentic AI API, read once via get_config()"""
 
     # Provider selection
-    OPENAI_PROVIDER = os.getenv("OPENAI_PROVIDER", "openai").lower()
+    OPENAI_PROVIDER: str = _env("OPENAI_PROVIDER", "openai", str.lower)
 
     # Regular OpenAI settings
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_API_KEY: Optional[str] = _env("OPENAI_API_KEY", None)
 
     # Azure OpenAI settings
-    AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-    AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-    AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+    AZURE_OPENAI_API_KEY: Optional[str] = _env("AZURE_OPENAI_API_KEY", None)
+    AZURE_OPENAI_ENDPOINT: Optional[str] = _env("AZURE_OPENAI_ENDPOINT", None)
+    AZURE_OPENAI_API_VERSION: str = _env("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
 
     # Model settings (deployment names for Azure, model names for OpenAI)
-    FAST_MODEL = os.getenv("FAST_MODEL", "gpt-4o-mini")
-    SLOW_MODEL = os.getenv("SLOW_MODEL", "gpt-4o")
+    FAST_MODEL: str = _env("FAST_MODEL", "gpt-4o-mini")
+    SLOW_MODEL: str = _env("SLOW_MODEL", "gpt-4o")
 
-    # Flask settings
-    FLASK_PORT = int(os.getenv("FLASK_PORT", 5000))
-    FLASK_DEBUG = os.getenv("FLASK_DEBUG", "True").lower() == "true"
+    # Server settings (FLASK_DEBUG turns on DEBUG pipeline logging, which includes prompts and reasoning)
+    FLASK_PORT: int = _env("FLASK_PORT", 5000, int)
+    FLASK_DEBUG: bool = _env("FLASK_DEBUG", False, _as_bool)
 
     # Chain-of-thought settings
-    DEFAULT_COT_STEPS = 3
-    MAX_COT_STEPS = 10
+    DEFAULT_COT_STEPS: int = 3
+    MAX_COT_STEPS: int = 10
+    # True: each step builds on the previous ones (sequential calls)
+    # False: steps are independent angles on the question (concurrent calls)
+    DEPENDENT_COT_STEPS: bool = _env("DEPENDENT_COT_STEPS", True, _as_bool)
 
     # Self-consistency settings
-    DEFAULT_SELF_CONSISTENCY_SAMPLES = 5
-    MAX_SELF_CONSISTENCY_SAMPLES = 15
+    DEFAULT_SELF_CONSISTENCY_SAMPLES: int = 5
+    MAX_SELF_CONSISTENCY_SAMPLES: int = 15
+    # Request identical prompts once with n=<num samples> instead of N times
+    BATCH_SAMPLE_REQUESTS: bool = _env("BATCH_SAMPLE_REQUESTS", True, _as_bool)
+    # Generate each sample's CoT steps and final answer in one LLM call
+    # (False uses one call per CoT step plus a separate final-answer call)
+    SINGLE_CALL_SAMPLES: bool = _env("SINGLE_CALL_SAMPLES", True, _as_bool)
+
+    # Fewest completed samples before a request's early_stop_threshold can stop sampling
+    EARLY_STOP_MIN_SAMPLES: int = _env("EARLY_STOP_MIN_SAMPLES", 3, int)
+
+    # Reflection settings (skip the reflection call when sample agreement reaches the threshold)
+    SKIP_REFLECTION_ON_CONSENSUS: bool = _env("SKIP_REFLECTION_ON_CONSENSUS", True, _as_bool)
+    CONSENSUS_THRESHOLD: float = _env("CONSENSUS_THRESHOLD", 100.0, float)
 
-    @classmethod
-    def validate(cls):
+    # Concurrency settings (maximum in-flight LLM requests per engine)
+    MAX_CONCURRENCY: int = _env("MAX_CONCURRENCY", 8, int)
+    SLOW_MODEL_MAX_CONCURRENCY: int = _env("SLOW_MODEL_MAX_CONCURRENCY", 4, int)
+    # Process-wide cap across all engines, and attempts per LLM request when rate limited (HTTP 429)
+    LLM_MAX_CONCURRENCY: int = _env("LLM_MAX_CONCURRENCY", 16, int)
+    LLM_MAX_RETRIES: int = _env("LLM_MAX_RETRIES", 5, int)
+
+    # Semantic cache settings (reuse responses for near-identical prompts with identical parameters;
+    # opt-in, since a near neighbour is not always the same question)
+    SEMANTIC_CACHE_ENABLED: bool = _env("SEMANTIC_CACHE_ENABLED", False, _as_bool)
+    SEMANTIC_CACHE_THRESHOLD: float = _env("SEMANTIC_CACHE_THRESHOLD", 0.95, float)
+    SEMANTIC_CACHE_SIZE: int = _env("SEMANTIC_CACHE_SIZE", 1024, int)
+    EMBEDDING_MODEL: str = _env("EMBEDDING_MODEL", "text-embedding-3-small")
+
+    # Exact-input result cache (deterministic runs, or requests with cache=true)
+    RESULT_CACHE_SIZE: int = _env("RESULT_CACHE_SIZE", 256, int)
+    RESULT_CACHE_TTL: float = _env("RESULT_CACHE_TTL", 3600.0, float)
+
+    # Seconds between status checks for requests run with mode="batch", and the longest
+    # wait before the batch is cancelled and the samples are generated directly instead
+    BATCH_POLL_INTERVAL: float = _env("BATCH_POLL_INTERVAL", 30.0, float)
+    BATCH_MAX_WAIT: float = _env("BATCH_MAX_WAIT", 600.0, float)
+
+    def validate(self):
         """Validate that required configuration is present"""
-        if cls.OPENAI_PROVIDER == "azure":
-            if not cls.AZURE_OPENAI_API_KEY:
+        if self.OPENAI_PROVIDER == "azure":
+            if not self.AZURE_OPENAI_API_KEY:
                 raise ValueError("AZURE_OPENAI_API_KEY must be set in environment or .env file")
-            if not cls.AZURE_OPENAI_ENDPOINT:
+            if not self.AZURE_OPENAI_ENDPOINT:
                 raise ValueError("AZURE_OPENAI_ENDPOINT must be set in environment or .env file")
         else:
-            if not cls.OPENAI_API_KEY:
+            if not self.OPENAI_API_KEY:
                 raise ValueError("OPENAI_API_KEY must be set in environment or .env file")
         return True
+
+
+@functools.lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Load the configuration from the environment (once per process)"""
+    return Config()
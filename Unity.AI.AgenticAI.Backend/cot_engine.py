@@ -1,37 +1,87 @@
 from langchain_openai import ChatOpenAI, AzureChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import HumanMessage, SystemMessage
-from models import ChainOfThoughtStep
-from config import Config
-from typing import List
+from models import ChainOfThoughtStep, ReasoningSampleSchema
+from config import get_config
+from typing import List, Optional
 import json
 import asyncio
+import contextlib
+import httpx
+import logging
+import openai
+import re
+import time
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+config = get_config()
+
+logger = logging.getLogger(__name__)
+
+# Async HTTP client shared by every engine, so connections (HTTP/2, kept alive)
+# are reused across engines and requests instead of one pool per engine
+http_async_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=128, max_keepalive_connections=64),
+    timeout=60
+)
+
+# Process-wide cap on in-flight LLM requests across all engines, on top of each
+# engine's own limit, so concurrent requests stay within the account's rate limits
+LLM_SEMAPHORE = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+
+# JSON-mode response format for raw (non-LangChain-structured) single-call samples.
+# Azure only accepts json_schema from API version 2024-08-01-preview; older versions
+# get plain JSON mode, with the expected shape spelled out in the prompt instead.
+if config.OPENAI_PROVIDER == "azure" and config.AZURE_OPENAI_API_VERSION < "2024-08-01":
+    SAMPLE_RESPONSE_FORMAT = {"type": "json_object"}
+else:
+    SAMPLE_RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": ReasoningSampleSchema.__name__,
+            "schema": ReasoningSampleSchema.model_json_schema()
+        }
+    }
+
+# Outermost {...} span, used to pull a JSON object out of code fences or surrounding prose
+_JSON_RE = re.compile(r"\{[\s\S]*\}")
 
 
 class ChainOfThoughtEngine:
     """Engine for generating chain-of-thought reasoning using LangChain"""
 
-    # Constants for JSON extraction
-    JSON_CODE_BLOCK = "```json"
-    CODE_BLOCK = "```"
-    JSON_CODE_BLOCK_OFFSET = 7  # Length of "```json"
-    CODE_BLOCK_OFFSET = 3  # Length of "```"
+    # What each step is asked to do: first step, middle steps, final step
+    STEP_ROLES = (
+        "Generate step {step_num} of {num_steps} reasoning steps. What is the first thing we need to consider or break down?",
+        "Generate step {step_num} of {num_steps}. Build upon the previous reasoning.",
+        "Generate the final step {step_num} of {num_steps}. Synthesize the previous steps and provide a conclusive reasoning."
+    )
+
+    COT_AND_ANSWER_SYSTEM_PROMPT = "You are an expert reasoning assistant. Break down complex problems into clear, logical steps, then synthesize them into a clear answer with a confidence score."
+
+    def __init__(self, model_name: str, temperature: float = 0.7, max_concurrency: int = None):
+        self.model_name = model_name
+
+        # Bounds in-flight LLM requests for this engine to stay within provider rate limits
+        self.semaphore = asyncio.Semaphore(max_concurrency or config.MAX_CONCURRENCY)
 
-    def __init__(self, model_name: str, temperature: float = 0.7):
         # Choose between Azure OpenAI and regular OpenAI
-        if Config.OPENAI_PROVIDER == "azure":
+        if config.OPENAI_PROVIDER == "azure":
             self.llm = AzureChatOpenAI(
                 azure_deployment=model_name,
-                api_version=Config.AZURE_OPENAI_API_VERSION,
-                azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
-                api_key=Config.AZURE_OPENAI_API_KEY,
-                temperature=temperature
+                api_version=config.AZURE_OPENAI_API_VERSION,
+                azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+                api_key=config.AZURE_OPENAI_API_KEY,
+                temperature=temperature,
+                http_async_client=http_async_client
             )
         else:
             self.llm = ChatOpenAI(
                 model=model_name,
                 temperature=temperature,
-                api_key=Config.OPENAI_API_KEY
+                api_key=config.OPENAI_API_KEY,
+                http_async_client=http_async_client
             )
         self.step_prompt_template = ChatPromptTemplate.from_messages([
             ("system", """You are an expert reasoning assistant. Break down complex problems
@@ -43,62 +93,189 @@ class ChainOfThoughtEngine:
             ("human", "{instruction}")
         ])
 
-    def _build_step_instruction(self, step_num: int, num_steps: int, context: str, steps: List[ChainOfThoughtStep]) -> str:
-        """Build instruction for a specific CoT step"""
-        if step_num == 1:
-            return f"{context}Generate step {step_num} of {num_steps} reasoning steps. What is the first thing we need to consider or break down?"
+    @contextlib.asynccontextmanager
+    async def llm_slot(self):
+        """Hold this engine's and the process-wide concurrency slot for one LLM request"""
+        async with self.semaphore, LLM_SEMAPHORE:
+            yield
 
-        previous_steps = "\n".join([
-            f"Step {s.step_number}: {s.reasoning} → {s.intermediate_conclusion}"
-            for s in steps
-        ])
+    async def call_llm(self, request):
+        """
+        Run one LLM request within the concurrency limits, retrying on rate limiting
 
-        if step_num == num_steps:
-            return f"{context}Previous steps:\n{previous_steps}\n\nGenerate the final step {step_num} of {num_steps}. Synthesize the previous steps and provide a conclusive reasoning."
+        Args:
+            request: Zero-argument callable returning the request coroutine
+                (called again for each attempt)
 
-        return f"{context}Previous steps:\n{previous_steps}\n\nGenerate step {step_num} of {num_steps}. Build upon the previous reasoning."
+        Returns:
+            The request's result
+        """
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception_type(openai.RateLimitError),
+            # Jittered so requests rate limited together do not all retry at the same moment
+            wait=wait_exponential_jitter(initial=2, max=30, jitter=2),
+            stop=stop_after_attempt(config.LLM_MAX_RETRIES),
+            reraise=True
+        ):
+            with attempt:
+                async with self.llm_slot():
+                    return await request()
+
+    def _format_step_line(self, step: ChainOfThoughtStep) -> str:
+        """Format a completed step for the "Previous steps" section of a step instruction"""
+        return f"Step {step.step_number}: {step.reasoning} → {step.intermediate_conclusion}"
+
+    def _build_step_instruction(self, step_num: int, num_steps: int, context: str, step_lines: List[str]) -> str:
+        """Build instruction for a specific CoT step from the formatted previous steps"""
+        role = self.STEP_ROLES[0 if step_num == 1 else 2 if step_num == num_steps else 1]
+        previous_steps = "Previous steps:\n" + "\n".join(step_lines) + "\n\n" if step_num > 1 else ""
+        return context + previous_steps + role.format(step_num=step_num, num_steps=num_steps)
+
+    def _build_independent_step_instruction(self, step_num: int, num_steps: int, context: str) -> str:
+        """Build instruction for a CoT step that does not depend on the other steps"""
+        return (
+            f"{context}Generate step {step_num} of {num_steps} reasoning steps. "
+            f"Each step analyzes the question from a different angle; give the reasoning and "
+            f"conclusion for angle {step_num} on its own, without relying on the other steps."
+        )
+
+    def extract_usage(self, response) -> dict:
+        """Read token usage from an LLM response as prompt/completion/total token counts"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            return {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)
+            }
+
+        usage = getattr(response, "response_metadata", {}).get("token_usage") or {}
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0)
+        }
 
     def _update_token_usage(self, response, total_tokens: dict) -> None:
         """Update token usage from response metadata"""
-        if hasattr(response, 'usage_metadata') and response.usage_metadata:
-            total_tokens["prompt_tokens"] += response.usage_metadata.get("input_tokens", 0)
-            total_tokens["completion_tokens"] += response.usage_metadata.get("output_tokens", 0)
-            total_tokens["total_tokens"] += response.usage_metadata.get("total_tokens", 0)
-        elif hasattr(response, 'response_metadata') and 'token_usage' in response.response_metadata:
-            usage = response.response_metadata['token_usage']
-            total_tokens["prompt_tokens"] += usage.get("prompt_tokens", 0)
-            total_tokens["completion_tokens"] += usage.get("completion_tokens", 0)
-            total_tokens["total_tokens"] += usage.get("total_tokens", 0)
-
-    def _extract_json_content(self, content: str) -> str:
-        """Extract JSON content from markdown code blocks"""
-        if self.JSON_CODE_BLOCK in content:
-            json_start = content.find(self.JSON_CODE_BLOCK) + self.JSON_CODE_BLOCK_OFFSET
-            json_end = content.find(self.CODE_BLOCK, json_start)
-            return content[json_start:json_end].strip()
-
-        if self.CODE_BLOCK in content:
-            json_start = content.find(self.CODE_BLOCK) + self.CODE_BLOCK_OFFSET
-            json_end = content.find(self.CODE_BLOCK, json_start)
-            return content[json_start:json_end].strip()
-
-        return content
+        for key, count in self.extract_usage(response).items():
+            total_tokens[key] += count
 
-    def _parse_step_content(self, content: str) -> tuple[str, str]:
-        """Parse reasoning and conclusion from step content"""
+    def _extract_json(self, content: str) -> Optional[dict]:
+        """
+        Parse a JSON object from LLM output
+
+        Tries the whole content first, then the outermost {...} span (which
+        also covers ```json code blocks). Returns None if no object is found.
+        """
         try:
             parsed = json.loads(content)
+        except json.JSONDecodeError:
+            match = _JSON_RE.search(content)
+            if not match:
+                return None
+            try:
+                parsed = json.loads(match.group(0))
+            except json.JSONDecodeError:
+                return None
+        return parsed if isinstance(parsed, dict) else None
+
+    def _parse_step_content(self, content: str) -> tuple[str, str]:
+        """Parse reasoning and conclusion from step content"""
+        parsed = self._extract_json(content)
+        if parsed is not None:
             reasoning = parsed.get("reasoning", content)
             conclusion = parsed.get("intermediate_conclusion", "")
             return reasoning, conclusion
-        except json.JSONDecodeError:
-            # Fallback: split content
-            parts = content.split("\n", 1)
-            reasoning = parts[0] if parts else content
-            conclusion = parts[1] if len(parts) > 1 else reasoning
-            return reasoning, conclusion
 
-    async def agenerate_cot_steps(self, prompt: str, num_steps: int, system_prompt: str = None) -> tuple[List[ChainOfThoughtStep], dict]:
+        # Fallback: split content
+        parts = content.split("\n", 1)
+        reasoning = parts[0] if parts else content
+        conclusion = parts[1] if len(parts) > 1 else reasoning
+        return reasoning, conclusion
+
+    def _build_context(self, prompt: str, system_prompt: str = None) -> str:
+        """Build the question context shared by every CoT step"""
+        if system_prompt:
+            return f"System Context: {system_prompt}\n\nOriginal question: {prompt}\n\n"
+        return f"Original question: {prompt}\n\n"
+
+    def _parse_step(self, step_num: int, content: str) -> ChainOfThoughtStep:
+        """Parse raw LLM output into a ChainOfThoughtStep"""
+        reasoning, conclusion = self._parse_step_content(content.strip())
+        return ChainOfThoughtStep(
+            step_number=step_num,
+            reasoning=reasoning,
+            intermediate_conclusion=conclusion
+        )
+
+    def _error_step(self, step_num: int, error: Exception) -> ChainOfThoughtStep:
+        """Fallback step used when step generation fails"""
+        return ChainOfThoughtStep(
+            step_number=step_num,
+            reasoning=f"Error in step generation: {str(error)}",
+            intermediate_conclusion="Unable to generate conclusion for this step",
+            is_error=True
+        )
+
+    async def _acontinue_cot_steps(self, context: str, num_steps: int, steps: List[ChainOfThoughtStep], total_tokens: dict) -> List[ChainOfThoughtStep]:
+        """Generate the remaining steps of a CoT path, each building on the ones before it"""
+        # Formatted once per step and reused by every later step's instruction
+        step_lines = [self._format_step_line(step) for step in steps]
+
+        for step_num in range(len(steps) + 1, num_steps + 1):
+            # Build instruction for this step
+            instruction = self._build_step_instruction(step_num, num_steps, context, step_lines)
+
+            # Generate step
+            try:
+                messages = self.step_prompt_template.format_messages(instruction=instruction)
+                response = await self.call_llm(lambda: self.llm.ainvoke(messages))
+
+                # Track token usage
+                self._update_token_usage(response, total_tokens)
+
+                step = self._parse_step(step_num, response.content)
+
+            except Exception as e:
+                # Fallback step on error
+                step = self._error_step(step_num, e)
+
+            steps.append(step)
+            step_lines.append(self._format_step_line(step))
+
+        return steps
+
+    async def _agenerate_independent_steps(self, context: str, num_steps: int, total_tokens: dict) -> List[ChainOfThoughtStep]:
+        """Generate all steps of a CoT path concurrently, each from the original question only"""
+        messages_list = [
+            self.step_prompt_template.format_messages(
+                instruction=self._build_independent_step_instruction(step_num, num_steps, context)
+            )
+            for step_num in range(1, num_steps + 1)
+        ]
+
+        responses = await asyncio.gather(*[
+            self.call_llm(lambda messages=messages: self.llm.ainvoke(messages))
+            for messages in messages_list
+        ], return_exceptions=True)
+
+        steps = []
+        for step_num, response in enumerate(responses, 1):
+            # BaseException, so a cancelled step (CancelledError) also gets a fallback step
+            if isinstance(response, BaseException):
+                # Fallback step on error
+                steps.append(self._error_step(step_num, response))
+                continue
+
+            # Track token usage
+            self._update_token_usage(response, total_tokens)
+
+            steps.append(self._parse_step(step_num, response.content))
+
+        return steps
+
+    async def agenerate_cot_steps(self, prompt: str, num_steps: int, system_prompt: str = None, dependent: bool = True) -> tuple[List[ChainOfThoughtStep], dict]:
         """
         Generate chain-of-thought reasoning steps for a given prompt
 
@@ -106,47 +283,84 @@ class ChainOfThoughtEngine:
             prompt: The user's input prompt
             num_steps: Number of reasoning steps to generate
             system_prompt: Optional system prompt to provide context and instructions
+            dependent: If True, each step builds on the previous ones and steps run sequentially;
+                if False, steps are independent angles on the question and run concurrently
 
         Returns:
             Tuple of (List of ChainOfThoughtStep objects, token_usage dict)
         """
-        steps = []
-        context = f"System Context: {system_prompt}\n\nOriginal question: {prompt}\n\n" if system_prompt else f"Original question: {prompt}\n\n"
+        context = self._build_context(prompt, system_prompt)
         total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
-        for step_num in range(1, num_steps + 1):
-            # Build instruction for this step
-            instruction = self._build_step_instruction(step_num, num_steps, context, steps)
+        if dependent:
+            steps = await self._acontinue_cot_steps(context, num_steps, [], total_tokens)
+        else:
+            steps = await self._agenerate_independent_steps(context, num_steps, total_tokens)
 
-            # Generate step
-            try:
-                messages = self.step_prompt_template.format_messages(instruction=instruction)
-                response = await self.llm.ainvoke(messages)
+        return steps, total_tokens
 
-                # Track token usage
-                self._update_token_usage(response, total_tokens)
+    async def _agenerate_step_samples(self, step_num: int, instruction: str, num_paths: int, total_tokens: dict) -> List[ChainOfThoughtStep]:
+        """
+        Generate num_paths samples of one step whose prompt is identical for
+        every path, as a single request with n=num_paths
+        """
+        try:
+            messages = self.step_prompt_template.format_messages(instruction=instruction)
+            result = await self.call_llm(lambda: self.llm.agenerate([messages], n=num_paths))
 
-                # Parse response
-                content = self._extract_json_content(response.content.strip())
-                reasoning, conclusion = self._parse_step_content(content)
+            # Usage for all n completions is reported once for the request
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            for key in total_tokens:
+                total_tokens[key] += usage.get(key, 0)
 
-                step = ChainOfThoughtStep(
-                    step_number=step_num,
-                    reasoning=reasoning,
-                    intermediate_conclusion=conclusion
-                )
-                steps.append(step)
+            return [self._parse_step(step_num, generation.message.content) for generation in result.generations[0]]
 
-            except Exception as e:
-                # Fallback step on error
-                step = ChainOfThoughtStep(
-                    step_number=step_num,
-                    reasoning=f"Error in step generation: {str(e)}",
-                    intermediate_conclusion="Unable to generate conclusion for this step"
+        except Exception as e:
+            # Fallback step on error
+            return [self._error_step(step_num, e) for _ in range(num_paths)]
+
+    async def agenerate_cot_paths(self, prompt: str, num_steps: int, num_paths: int, system_prompt: str = None, dependent: bool = True) -> tuple[List[List[ChainOfThoughtStep]], dict]:
+        """
+        Generate several independent chain-of-thought paths for the same prompt
+
+        Step prompts that are identical for every path are sent once with
+        n=num_paths, so the API returns num_paths sampled completions and
+        bills the prompt tokens once. That is the first step of dependent
+        paths (later steps depend on each path's own history and are
+        generated per path in parallel), and every step of independent paths.
+
+        Args:
+            prompt: The user's input prompt
+            num_steps: Number of reasoning steps per path
+            num_paths: Number of independent paths to generate
+            system_prompt: Optional system prompt to provide context and instructions
+            dependent: If False, steps within each path are independent and run concurrently
+
+        Returns:
+            Tuple of (List of step lists, one per path, aggregated token_usage dict)
+        """
+        context = self._build_context(prompt, system_prompt)
+        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+        if not dependent:
+            # One n=num_paths request per step; sample i of every step forms path i
+            step_samples = await asyncio.gather(*[
+                self._agenerate_step_samples(
+                    step_num, self._build_independent_step_instruction(step_num, num_steps, context), num_paths, total_tokens
                 )
-                steps.append(step)
+                for step_num in range(1, num_steps + 1)
+            ])
+            return [list(path) for path in zip(*step_samples)], total_tokens
 
-        return steps, total_tokens
+        instruction = self._build_step_instruction(1, num_steps, context, [])
+        first_steps = await self._agenerate_step_samples(1, instruction, num_paths, total_tokens)
+
+        paths = await asyncio.gather(*[
+            self._acontinue_cot_steps(context, num_steps, [step], total_tokens)
+            for step in first_steps
+        ])
+
+        return list(paths), total_tokens
 
     async def agenerate_final_answer(self, prompt: str, cot_steps: List[ChainOfThoughtStep], system_prompt: str = None) -> tuple[str, float, dict]:
         """
@@ -204,35 +418,268 @@ Return ONLY a JSON object in this exact format:
             HumanMessage(content=final_prompt)
         ]
 
-        response = await self.llm.ainvoke(messages)
+        response = await self.call_llm(lambda: self.llm.ainvoke(messages))
         content = response.content.strip()
 
         # Track token usage
-        token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-        if hasattr(response, 'usage_metadata') and response.usage_metadata:
-            token_usage["prompt_tokens"] = response.usage_metadata.get("input_tokens", 0)
-            token_usage["completion_tokens"] = response.usage_metadata.get("output_tokens", 0)
-            token_usage["total_tokens"] = response.usage_metadata.get("total_tokens", 0)
-        elif hasattr(response, 'response_metadata') and 'token_usage' in response.response_metadata:
-            usage = response.response_metadata['token_usage']
-            token_usage["prompt_tokens"] = usage.get("prompt_tokens", 0)
-            token_usage["completion_tokens"] = usage.get("completion_tokens", 0)
-            token_usage["total_tokens"] = usage.get("total_tokens", 0)
+        token_usage = self.extract_usage(response)
 
         # Try to parse JSON response
-        try:
-            # Extract JSON if wrapped in code blocks
-            content = self._extract_json_content(content)
+        parsed = self._extract_json(content)
+        if parsed is not None:
+            try:
+                answer = parsed.get("answer", content)
+                confidence = float(parsed.get("confidence", 50.0))
 
-            parsed = json.loads(content)
-            answer = parsed.get("answer", content)
-            confidence = float(parsed.get("confidence", 50.0))
+                # Ensure confidence is in valid range
+                confidence = max(0.0, min(100.0, confidence))
+
+                return answer, confidence, token_usage
+
+            except (TypeError, ValueError):
+                pass
+
+        # Fallback: use content as answer, default confidence
+        return content, 50.0, token_usage
+
+    def _build_cot_and_answer_messages(self, prompt: str, num_steps: int, system_prompt: str = None) -> tuple[str, str]:
+        """Build the (system, human) message contents for a single-call reasoning sample"""
+        context = self._build_context(prompt, system_prompt)
+        instruction = f"""{context}Reason through the original question in exactly {num_steps} steps.
+For each step, provide the reasoning and an intermediate conclusion; the last step
+should synthesize the previous steps into a conclusive reasoning.
+
+Then, based on this chain of reasoning, provide:
+1. A clear, concise final answer to the original question
+2. Your confidence level (0-100) considering:
+   - Strength and validity of your reasoning
+   - Certainty in your conclusion
+   - Any ambiguities, assumptions, or limitations"""
+
+        if SAMPLE_RESPONSE_FORMAT["type"] == "json_object":
+            # JSON mode does not carry the schema, so describe it
+            instruction += """
+
+Return ONLY a JSON object in this exact format:
+{"steps": [{"reasoning": "...", "intermediate_conclusion": "..."}], "final_answer": "your final answer here", "confidence": 85}"""
+
+        return self.COT_AND_ANSWER_SYSTEM_PROMPT, instruction
+
+    def _sample_from_schema(self, parsed: ReasoningSampleSchema, num_steps: int) -> tuple[List[ChainOfThoughtStep], str, float]:
+        """Convert a parsed single-call reasoning sample into (steps, final_answer, confidence)"""
+        steps = [
+            ChainOfThoughtStep(
+                step_number=step_num,
+                reasoning=step.reasoning,
+                intermediate_conclusion=step.intermediate_conclusion
+            )
+            for step_num, step in enumerate(parsed.steps[:num_steps], 1)
+        ]
+
+        # Ensure confidence is in valid range
+        confidence = max(0.0, min(100.0, parsed.confidence))
+
+        return steps, parsed.final_answer, confidence
+
+    async def agenerate_cot_and_answer(self, prompt: str, num_steps: int, system_prompt: str = None) -> tuple[List[ChainOfThoughtStep], str, float, dict]:
+        """
+        Generate chain-of-thought steps and the final answer in a single LLM call
+
+        Args:
+            prompt: The user's input prompt
+            num_steps: Number of reasoning steps to generate
+            system_prompt: Optional system prompt to provide context and instructions
+
+        Returns:
+            Tuple of (List of ChainOfThoughtStep objects, final_answer, confidence_score, token_usage)
+        """
+        system_content, instruction = self._build_cot_and_answer_messages(prompt, num_steps, system_prompt)
+        messages = [
+            SystemMessage(content=system_content),
+            HumanMessage(content=instruction)
+        ]
+
+        structured_llm = self.llm.with_structured_output(ReasoningSampleSchema, include_raw=True)
+        result = await self.call_llm(lambda: structured_llm.ainvoke(messages))
+
+        # Track token usage
+        token_usage = self.extract_usage(result["raw"])
+
+        parsed = result["parsed"]
+        if parsed is None:
+            # Fallback: use raw content as answer, default confidence
+            content = result["raw"].content.strip() or str(result["parsing_error"])
+            return [self._error_step(1, result["parsing_error"])], content, 50.0, token_usage
+
+        steps, final_answer, confidence = self._sample_from_schema(parsed, num_steps)
+        return steps, final_answer, confidence, token_usage
+
+    async def agenerate_n_samples(
+        self,
+        prompt: str,
+        num_steps: int,
+        n: int,
+        system_prompt: str = None
+    ) -> tuple[List[tuple[List[ChainOfThoughtStep], str, float]], dict]:
+        """
+        Generate n single-call reasoning samples with one n=<n> request
+
+        The sample prompt is identical for every sample, so it is sent (and
+        its prompt tokens billed) once; temperature sampling still yields n
+        distinct reasoning paths.
+
+        Args:
+            prompt: The user's input prompt
+            num_steps: Number of reasoning steps per sample
+            n: Number of samples to generate
+            system_prompt: Optional system prompt to provide context and instructions
+
+        Returns:
+            Tuple of (List of (steps, final_answer, confidence) per sample, token_usage dict);
+            completions with no content are left out
+
+        Raises:
+            ValueError: If no completion has any content
+        """
+        system_content, instruction = self._build_cot_and_answer_messages(prompt, num_steps, system_prompt)
+        messages = [
+            SystemMessage(content=system_content),
+            HumanMessage(content=instruction)
+        ]
+
+        # Provider errors propagate: n copies of one error answer would read as a unanimous vote
+        result = await self.call_llm(
+            lambda: self.llm.agenerate([messages], n=n, response_format=SAMPLE_RESPONSE_FORMAT)
+        )
+
+        # Usage for all n completions is reported once for the request
+        token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        for key in token_usage:
+            token_usage[key] += usage.get(key, 0)
+
+        results = []
+        for generation in result.generations[0]:
+            content = generation.message.content.strip()
+            if not content:
+                continue
+            try:
+                parsed = ReasoningSampleSchema.model_validate_json(content)
+            except Exception as e:
+                # Fallback: use raw content as answer, default confidence
+                results.append(([self._error_step(1, e)], content, 50.0))
+                continue
+            results.append(self._sample_from_schema(parsed, num_steps))
+
+        if not results:
+            raise ValueError(f"None of the {n} completions returned any content")
+
+        return results, token_usage
+
+    async def abatch_cot_and_answer(
+        self,
+        prompt: str,
+        num_steps: int,
+        num_samples: int,
+        system_prompt: str = None
+    ) -> tuple[List[tuple[List[ChainOfThoughtStep], str, float]], dict]:
+        """
+        Generate single-call reasoning samples through the OpenAI Batch API
+
+        All samples are submitted as one batch job, which is billed at a
+        discount but may take minutes to complete; the job is polled every
+        config.BATCH_POLL_INTERVAL seconds and cancelled after
+        config.BATCH_MAX_WAIT seconds.
+
+        Args:
+            prompt: The user's input prompt
+            num_steps: Number of reasoning steps per sample
+            num_samples: Number of samples to generate
+            system_prompt: Optional system prompt to provide context and instructions
+
+        Returns:
+            Tuple of (List of (steps, final_answer, confidence) per successful sample,
+                     aggregated token_usage dict); missing or failed samples are left out
+
+        Raises:
+            TimeoutError: If the batch job is still running after config.BATCH_MAX_WAIT seconds
+            RuntimeError: If the batch job does not complete or no sample succeeds
+        """
+        system_content, instruction = self._build_cot_and_answer_messages(prompt, num_steps, system_prompt)
+        if config.OPENAI_PROVIDER == "azure":
+            model, url = self.llm.deployment_name, "/chat/completions"
+        else:
+            model, url = self.llm.model_name, "/v1/chat/completions"
+
+        body = {
+            "model": model,
+            "temperature": self.llm.temperature,
+            "messages": [
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": instruction}
+            ],
+            "response_format": SAMPLE_RESPONSE_FORMAT
+        }
+        batch_input = "\n".join(
+            json.dumps({"custom_id": f"sample-{sample_num}", "method": "POST", "url": url, "body": body})
+            for sample_num in range(1, num_samples + 1)
+        )
+
+        client = self.llm.root_async_client
+        input_file = await client.files.create(file=("samples.jsonl", batch_input.encode()), purpose="batch")
+        batch = await client.batches.create(input_file_id=input_file.id, endpoint=url, completion_window="24h")
+
+        # The completion window is 24h, far longer than a caller can wait for a response
+        deadline = time.monotonic() + config.BATCH_MAX_WAIT
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                try:
+                    await client.batches.cancel(batch.id)
+                except openai.OpenAIError as e:
+                    logger.warning("Could not cancel batch %s: %s", batch.id, e)
+                raise TimeoutError(f"Batch {batch.id} did not complete within {config.BATCH_MAX_WAIT} seconds")
+            await asyncio.sleep(min(config.BATCH_POLL_INTERVAL, remaining))
+            batch = await client.batches.retrieve(batch.id)
+
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} did not complete (status: {batch.status})")
+
+        output = await client.files.content(batch.output_file_id)
+
+        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        # Missing or failed samples stay None and are left out, so they cannot vote
+        results = [None] * num_samples
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            sample_index = int(record["custom_id"].rsplit("-", 1)[1]) - 1
+            response_body = (record.get("response") or {}).get("body") or {}
+
+            usage = response_body.get("usage") or {}
+            for key in total_tokens:
+                total_tokens[key] += usage.get(key, 0)
+
+            try:
+                content = response_body["choices"][0]["message"]["content"].strip()
+            except (KeyError, IndexError, TypeError, AttributeError):
+                content = None
+            if not content:
+                logger.warning("Batch %s sample %s failed: %s", batch.id, record["custom_id"], record.get("error"))
+                continue
+
+            try:
+                parsed = ReasoningSampleSchema.model_validate_json(content)
+            except Exception as e:
+                # Fallback: use raw content as answer, default confidence
+                results[sample_index] = ([self._error_step(1, e)], content, 50.0)
+                continue
 
-            # Ensure confidence is in valid range
-            confidence = max(0.0, min(100.0, confidence))
+            results[sample_index] = self._sample_from_schema(parsed, num_steps)
 
-            return answer, confidence, token_usage
+        results = [result for result in results if result is not None]
+        if not results:
+            raise RuntimeError(f"Batch {batch.id} returned no successful samples")
 
-        except (json.JSONDecodeError, ValueError, KeyError):
-            # Fallback: use content as answer, default confidence
-            return content, 50.0, token_usage
+        return results, total_tokens
@@ -0,0 +1,14 @@
+"""
+Hypercorn settings for the Agentic AI API
+
+Usage: hypercorn --config file:hypercorn_conf.py app:app
+"""
+import os
+import sys
+
+# Hypercorn loads this file before putting the app directory on sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import get_config  # noqa: E402
+
+bind = [f"0.0.0.0:{get_config().FLASK_PORT}"]
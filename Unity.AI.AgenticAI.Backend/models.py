@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field
 from typing import Optional, Literal
 
 
@@ -32,6 +32,24 @@ class AgenticRequest(BaseModel):
         le=2.0,
         description="Temperature for response generation"
     )
+    mode: Literal["sync", "batch"] = Field(
+        default="sync",
+        description="'sync' for an immediate response, 'batch' to generate samples through the discounted, slower OpenAI Batch API"
+    )
+    early_stop_threshold: Optional[float] = Field(
+        default=None,
+        gt=0.0,
+        le=1.0,
+        description="Stop generating samples once this share of completed samples agree, or once the leading answer can no longer be overtaken (omit to always generate all samples)"
+    )
+    cache: bool = Field(
+        default=False,
+        description="Reuse the result of an identical earlier request even when temperature > 0 (temperature 0 results are always reused)"
+    )
+    no_cache: bool = Field(
+        default=False,
+        description="Bypass the response caches and always run the full pipeline"
+    )
 
 
 class ChainOfThoughtStep(BaseModel):
@@ -40,6 +58,11 @@ class ChainOfThoughtStep(BaseModel):
     step_number: int
     reasoning: str
     intermediate_conclusion: str
+    is_error: bool = Field(
+        default=False,
+        exclude=True,
+        description="Placeholder for a step that failed to generate (internal, not serialized)"
+    )
 
 
 class SelfConsistencySample(BaseModel):
@@ -56,6 +79,41 @@ class SelfConsistencySample(BaseModel):
     )
 
 
+class ReasoningStepSchema(BaseModel):
+    """Structured output schema for one step of a single-call reasoning sample"""
+
+    reasoning: str = Field(description="The reasoning for this step")
+    intermediate_conclusion: str = Field(description="The intermediate conclusion of this step")
+
+
+class ReasoningSampleSchema(BaseModel):
+    """Structured output schema for a reasoning path and its final answer in one call"""
+
+    steps: list[ReasoningStepSchema] = Field(
+        description="The chain-of-thought reasoning steps, in order"
+    )
+    final_answer: str = Field(
+        description="A clear, concise final answer to the original question"
+    )
+    confidence: float = Field(
+        description="Your confidence level in the final answer (0-100)"
+    )
+
+
+class ReflectionSchema(BaseModel):
+    """Structured output schema for the reflection call"""
+
+    refined_answer: str = Field(
+        description="A refined final answer that incorporates the best insights from all paths"
+    )
+    reflection_reasoning: str = Field(
+        description="Your reasoning for the refined answer"
+    )
+    confidence: float = Field(
+        description="Your confidence level in the refined answer (0-100)"
+    )
+
+
 class AgenticResponse(BaseModel):
     """Response model for the agentic AI API"""
 
@@ -99,5 +157,13 @@ class AgenticResponse(BaseModel):
     )
     timing: dict = Field(
         default_factory=dict,
-        description="Timing information (total_time in seconds)"
+        description="Timing information (total_time in seconds; cached is true when the response was served from a cache)"
+    )
+    stopped_early: bool = Field(
+        default=False,
+        description="Whether early stopping cancelled some samples before they completed"
+    )
+    pdf_info: Optional[dict] = Field(
+        default=None,
+        description="Uploaded PDF details (num_pages, metadata); omitted when no PDF was sent"
     )
@@ -1,13 +1,91 @@
-from cot_engine import ChainOfThoughtEngine
-from models import SelfConsistencySample, ChainOfThoughtStep
+from cot_engine import ChainOfThoughtEngine, http_async_client
+from config import get_config
+from models import SelfConsistencySample, ChainOfThoughtStep, ReflectionSchema
 from typing import List, Tuple
-from collections import Counter
+from collections import Counter, defaultdict
 from langchain.schema import HumanMessage, SystemMessage
+from cachetools import TTLCache
+from decimal import Decimal
 import re
 import asyncio
+import atexit
+import copy
+import hashlib
 import json
+import logging
+import sys
+import threading
 import time
 
+config = get_config()
+
+logger = logging.getLogger(__name__)
+
+# Event loop that lives for the whole process. All async LLM work is
+# submitted to it, so requests don't pay for creating a new loop and the
+# async HTTP clients can keep connections alive between requests.
+_event_loop = asyncio.new_event_loop()
+threading.Thread(target=_event_loop.run_forever, name="llm-event-loop", daemon=True).start()
+
+# The shared HTTP client's connections belong to this loop, so close them there on exit
+atexit.register(lambda: asyncio.run_coroutine_threadsafe(http_async_client.aclose(), _event_loop).result(timeout=5))
+
+# reflection_reasoning openings used when reflection fails and the preliminary answer is kept
+REFLECTION_FAILED = "Reflection failed: "
+REFLECTION_PARSING_FAILED = "Reflection parsing failed, using preliminary answer"
+
+# Complete pipeline results keyed by a hash of their inputs (see arun_self_consistency)
+_result_cache = TTLCache(maxsize=config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL)
+_result_cache_lock = threading.Lock()
+
+# First run of text between periods that contains something other than whitespace
+# (a period followed by a digit is a decimal point, not a sentence end)
+_FIRST_SENTENCE_RE = re.compile(r"(?:[^.]|\.(?=\d))*[^.\s](?:[^.]|\.(?=\d))*")
+_WHITESPACE_RE = re.compile(r"\s+")
+# An essentially numeric answer: one number (optional sign, thousands separators and
+# decimals) with at most an approximation mark, currency symbol, percent sign or a
+# unit of up to two words (e.g. "150 km", "42 kilometers", "$1,000", "3.5 m/s")
+_NUMERIC_ANSWER_RE = re.compile(
+    r"\s*(?:~|≈)?\s*(?P<currency>[$€£¥])?\s*"
+    r"(?P<number>[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?)"
+    r"\s*(?P<unit>%|°?[^\W\d_]+(?:/[^\W\d_]+)?(?:\s+[^\W\d_]+(?:/[^\W\d_]+)?)?)?"
+    r"\s*[!?,;:]*\s*"
+)
+# Units and currencies recognized in numeric answers, by the canonical name kept in the
+# answer key, so "42 km" and "42 kilometers" agree while "90 minutes" and "90 seconds" do not
+_UNITS = {
+    "%": ("%", "percent", "per cent"),
+    "usd": ("$", "dollar", "dollars", "usd"),
+    "eur": ("€", "euro", "euros", "eur"),
+    "gbp": ("£", "gbp"),
+    "jpy": ("¥", "yen", "jpy"),
+    "mm": ("mm", "millimeter", "millimeters", "millimetre", "millimetres"),
+    "cm": ("cm", "centimeter", "centimeters", "centimetre", "centimetres"),
+    "m": ("m", "meter", "meters", "metre", "metres"),
+    "km": ("km", "kilometer", "kilometers", "kilometre", "kilometres"),
+    "in": ("in", "inch", "inches"),
+    "ft": ("ft", "foot", "feet"),
+    "mi": ("mi", "mile", "miles"),
+    "g": ("g", "gram", "grams"),
+    "kg": ("kg", "kilogram", "kilograms", "kilo", "kilos"),
+    "lb": ("lb", "lbs", "pound", "pounds"),
+    "ml": ("ml", "milliliter", "milliliters", "millilitre", "millilitres"),
+    "l": ("l", "liter", "liters", "litre", "litres"),
+    "s": ("s", "sec", "secs", "second", "seconds"),
+    "min": ("min", "mins", "minute", "minutes"),
+    "h": ("h", "hr", "hrs", "hour", "hours"),
+    "day": ("day", "days"),
+    "week": ("week", "weeks"),
+    "month": ("month", "months"),
+    "year": ("yr", "yrs", "year", "years"),
+    "m/s": ("m/s",),
+    "km/h": ("km/h", "kmh", "kph"),
+    "mph": ("mph",),
+    "°c": ("°c", "celsius", "degrees celsius"),
+    "°f": ("°f", "fahrenheit", "degrees fahrenheit"),
+}
+_UNIT_NAMES = {alias: unit for unit, aliases in _UNITS.items() for alias in aliases}
+
 
 class SelfConsistencyEngine:
     """
@@ -15,96 +93,247 @@ class SelfConsistencyEngine:
     Generates multiple reasoning paths and selects the most consistent answer.
     """
 
-    def __init__(self, model_name: str, temperature: float = 0.9):
+    def __init__(self, model_name: str, temperature: float = 0.9, max_concurrency: int = None):
         """
         Initialize the self-consistency engine
 
         Args:
             model_name: Name of the LLM model to use
             temperature: Higher temperature for diverse reasoning paths
+            max_concurrency: Maximum concurrent LLM requests (defaults to config.MAX_CONCURRENCY)
         """
-        self.cot_engine = ChainOfThoughtEngine(model_name, temperature)
+        self.model_name = model_name
+        self.temperature = temperature
+        self.cot_engine = ChainOfThoughtEngine(model_name, temperature, max_concurrency)
 
-    async def _generate_single_sample_async(
+    async def generate_multiple_paths_async(
         self,
-        sample_num: int,
         prompt: str,
+        num_samples: int,
         num_cot_steps: int,
-        system_prompt: str = None
-    ) -> tuple[SelfConsistencySample, dict]:
+        system_prompt: str = None,
+        mode: str = "sync",
+        early_stop_threshold: float = None
+    ) -> tuple[List[SelfConsistencySample], dict, str, bool]:
         """
-        Generate a single sample asynchronously
+        Generate multiple independent reasoning paths IN PARALLEL
 
         Args:
-            sample_num: Sample number
             prompt: User's input prompt
+            num_samples: Number of independent reasoning paths to generate
             num_cot_steps: Number of CoT steps per path
             system_prompt: Optional system prompt to provide context and instructions
+            mode: "sync" for direct LLM calls, "batch" to submit all samples as one Batch API job
+            early_stop_threshold: Stop sampling once this share (0-1) of completed samples agree
+                or the leading answer can no longer be overtaken; None disables early stopping
+                (not applied in batch mode)
 
         Returns:
-            Tuple of (SelfConsistencySample object, token_usage dict)
+            Tuple of (List of SelfConsistencySample objects, aggregated token_usage dict,
+                     reasoning paths formatted for the reflection prompt,
+                     whether early stopping cancelled samples still in flight)
         """
-        # Generate chain-of-thought steps for this sample
-        cot_steps, cot_tokens = await self.cot_engine.agenerate_cot_steps(prompt, num_cot_steps, system_prompt)
+        if mode == "batch":
+            return await self._generate_batch_paths(prompt, num_samples, num_cot_steps, system_prompt)
+        if config.SINGLE_CALL_SAMPLES:
+            return await self._generate_single_call_paths(
+                prompt, num_samples, num_cot_steps, system_prompt, early_stop_threshold
+            )
+        return await self._generate_two_phase_paths(
+            prompt, num_samples, num_cot_steps, system_prompt, early_stop_threshold
+        )
 
-        # Generate final answer and confidence based on these steps
-        final_answer, llm_confidence, answer_tokens = await self.cot_engine.agenerate_final_answer(prompt, cot_steps, system_prompt)
+    async def _collect_samples(
+        self,
+        sample_coros: list,
+        total_tokens: dict,
+        early_stop_threshold: float = None
+    ) -> tuple[List[SelfConsistencySample], dict, str, bool]:
+        """
+        Build samples in completion order, formatting each reasoning path for
+        the reflection prompt while the remaining samples are still in flight
 
-        # Aggregate tokens for this sample
-        sample_tokens = {
-            "prompt_tokens": cot_tokens["prompt_tokens"] + answer_tokens["prompt_tokens"],
-            "completion_tokens": cot_tokens["completion_tokens"] + answer_tokens["completion_tokens"],
-            "total_tokens": cot_tokens["total_tokens"] + answer_tokens["total_tokens"]
-        }
+        Args:
+            sample_coros: Coroutines returning (sample_num, cot_steps, final_answer, llm_confidence, token_usage)
+            total_tokens: Token usage so far, updated in place
+            early_stop_threshold: When set, the remaining samples are cancelled once the leading
+                answer can no longer be overtaken, or once at least config.EARLY_STOP_MIN_SAMPLES
+                samples are in and this share (0-1) of them agree
 
-        sample = SelfConsistencySample(
-            sample_number=sample_num,
-            reasoning_path=cot_steps,
-            final_answer=final_answer,
-            llm_confidence=llm_confidence
-        )
-        return sample, sample_tokens
+        Returns:
+            Tuple of (completed samples ordered by sample number, total_tokens, reasoning_text,
+                     whether early stopping cancelled samples still in flight)
+        """
+        tasks = [asyncio.ensure_future(coro) for coro in sample_coros]
+        samples = [None] * len(tasks)
+        path_texts = [None] * len(tasks)
+        answer_counts = Counter()
+        completed = 0
+        stopped_early = False
+
+        for next_sample in asyncio.as_completed(tasks):
+            sample_num, cot_steps, final_answer, llm_confidence, sample_tokens = await next_sample
+            sample = SelfConsistencySample(
+                sample_number=sample_num,
+                reasoning_path=cot_steps,
+                final_answer=final_answer,
+                llm_confidence=llm_confidence
+            )
+            samples[sample_num - 1] = sample
+            path_texts[sample_num - 1] = self._format_reasoning_path(sample)
+
+            for key in total_tokens:
+                total_tokens[key] += sample_tokens[key]
+
+            if early_stop_threshold is None:
+                continue
+
+            completed += 1
+            remaining = len(tasks) - completed
+            answer_counts[sys.intern(self.extract_key_answer(final_answer))] += 1
+            top_counts = answer_counts.most_common(2)
+            top_count = top_counts[0][1]
+            runner_up_count = top_counts[1][1] if len(top_counts) > 1 else 0
+            if remaining and (
+                # Even if every remaining sample agreed on the runner-up, the leader still wins
+                top_count > runner_up_count + remaining
+                or (
+                    completed >= config.EARLY_STOP_MIN_SAMPLES
+                    and top_count / completed >= early_stop_threshold
+                )
+            ):
+                logger.debug("Stopping early after %d of %d samples", completed, len(tasks))
+                # cancel() is False for tasks that already finished, so this only counts real cancellations
+                stopped_early = any([task.cancel() for task in tasks])
+                break
 
-    async def generate_multiple_paths_async(
+        samples = [sample for sample in samples if sample is not None]
+        path_texts = [text for text in path_texts if text is not None]
+        return samples, total_tokens, "\n".join(path_texts), stopped_early
+
+    async def _single_call_sample(
         self,
+        sample_num: int,
         prompt: str,
-        num_samples: int,
         num_cot_steps: int,
         system_prompt: str = None
-    ) -> tuple[List[SelfConsistencySample], dict]:
-        """
-        Generate multiple independent reasoning paths IN PARALLEL
+    ) -> tuple[int, List[ChainOfThoughtStep], str, float, dict]:
+        """Generate one sample's CoT steps and final answer with a single LLM call"""
+        cot_steps, final_answer, llm_confidence, token_usage = await self.cot_engine.agenerate_cot_and_answer(
+            prompt, num_cot_steps, system_prompt
+        )
+        return sample_num, cot_steps, final_answer, llm_confidence, token_usage
 
-        Args:
-            prompt: User's input prompt
-            num_samples: Number of independent reasoning paths to generate
-            num_cot_steps: Number of CoT steps per path
-            system_prompt: Optional system prompt to provide context and instructions
+    async def _final_answer_sample(
+        self,
+        sample_num: int,
+        prompt: str,
+        cot_steps: List[ChainOfThoughtStep],
+        system_prompt: str = None
+    ) -> tuple[int, List[ChainOfThoughtStep], str, float, dict]:
+        """Generate the final answer for one sample's existing CoT steps"""
+        final_answer, llm_confidence, token_usage = await self.cot_engine.agenerate_final_answer(
+            prompt, cot_steps, system_prompt
+        )
+        return sample_num, cot_steps, final_answer, llm_confidence, token_usage
 
-        Returns:
-            Tuple of (List of SelfConsistencySample objects, aggregated token_usage dict)
+    async def _generate_single_call_paths(
+        self,
+        prompt: str,
+        num_samples: int,
+        num_cot_steps: int,
+        system_prompt: str = None,
+        early_stop_threshold: float = None
+    ) -> tuple[List[SelfConsistencySample], dict, str, bool]:
+        """
+        Generate reasoning paths with one combined CoT-and-answer LLM call per
+        sample, or a single n=<num_samples> call when requests are batched
+        (per-sample calls are kept when early stopping may cancel samples)
         """
-        # Create tasks for all samples to run in parallel
-        tasks = [
-            self._generate_single_sample_async(sample_num, prompt, num_cot_steps, system_prompt)
+        if config.BATCH_SAMPLE_REQUESTS and num_samples > 1 and early_stop_threshold is None:
+            results, total_tokens = await self.cot_engine.agenerate_n_samples(
+                prompt, num_cot_steps, num_samples, system_prompt
+            )
+            return self._samples_from_results(results, total_tokens)
+
+        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        return await self._collect_samples([
+            self._single_call_sample(sample_num, prompt, num_cot_steps, system_prompt)
             for sample_num in range(1, num_samples + 1)
-        ]
+        ], total_tokens, early_stop_threshold)
 
-        # Run all samples in parallel
-        results = await asyncio.gather(*tasks)
+    async def _generate_batch_paths(
+        self,
+        prompt: str,
+        num_samples: int,
+        num_cot_steps: int,
+        system_prompt: str = None
+    ) -> tuple[List[SelfConsistencySample], dict, str, bool]:
+        """
+        Generate single-call reasoning paths for all samples as one Batch API job,
+        falling back to direct sampling if the job does not finish in time
+        """
+        try:
+            results, total_tokens = await self.cot_engine.abatch_cot_and_answer(
+                prompt, num_cot_steps, num_samples, system_prompt
+            )
+        except TimeoutError as e:
+            logger.warning("%s; generating the samples directly", e)
+            return await self._generate_single_call_paths(prompt, num_samples, num_cot_steps, system_prompt)
+        return self._samples_from_results(results, total_tokens)
 
-        # Separate samples and token usage
-        samples = [result[0] for result in results]
+    def _samples_from_results(
+        self,
+        results: list,
+        total_tokens: dict
+    ) -> tuple[List[SelfConsistencySample], dict, str, bool]:
+        """Build samples and the reflection text from (steps, final_answer, confidence) results (never stopped early)"""
+        samples = [
+            SelfConsistencySample(
+                sample_number=sample_num,
+                reasoning_path=cot_steps,
+                final_answer=final_answer,
+                llm_confidence=llm_confidence
+            )
+            for sample_num, (cot_steps, final_answer, llm_confidence) in enumerate(results, 1)
+        ]
+        reasoning_text = "\n".join(self._format_reasoning_path(sample) for sample in samples)
 
-        # Aggregate tokens from all samples
-        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-        for result in results:
-            sample_tokens = result[1]
-            total_tokens["prompt_tokens"] += sample_tokens["prompt_tokens"]
-            total_tokens["completion_tokens"] += sample_tokens["completion_tokens"]
-            total_tokens["total_tokens"] += sample_tokens["total_tokens"]
+        return samples, total_tokens, reasoning_text, False
 
-        return samples, total_tokens
+    async def _generate_two_phase_paths(
+        self,
+        prompt: str,
+        num_samples: int,
+        num_cot_steps: int,
+        system_prompt: str = None,
+        early_stop_threshold: float = None
+    ) -> tuple[List[SelfConsistencySample], dict, str, bool]:
+        """
+        Generate reasoning paths in two phases: the chain-of-thought steps for
+        all samples are gathered first, then the final answers for all paths
+        """
+        # Phase 1: generate chain-of-thought steps for all samples in parallel
+        if config.BATCH_SAMPLE_REQUESTS:
+            cot_paths, total_tokens = await self.cot_engine.agenerate_cot_paths(
+                prompt, num_cot_steps, num_samples, system_prompt, config.DEPENDENT_COT_STEPS
+            )
+        else:
+            cot_results = await asyncio.gather(*[
+                self.cot_engine.agenerate_cot_steps(prompt, num_cot_steps, system_prompt, config.DEPENDENT_COT_STEPS)
+                for _ in range(num_samples)
+            ])
+            cot_paths = [cot_steps for cot_steps, _ in cot_results]
+            total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            for _, cot_tokens in cot_results:
+                for key in total_tokens:
+                    total_tokens[key] += cot_tokens[key]
+
+        # Phase 2: generate final answer and confidence for all paths in parallel
+        return await self._collect_samples([
+            self._final_answer_sample(sample_num, prompt, cot_steps, system_prompt)
+            for sample_num, cot_steps in enumerate(cot_paths, 1)
+        ], total_tokens, early_stop_threshold)
 
     def extract_key_answer(self, answer: str) -> str:
         """
@@ -114,25 +343,29 @@ class SelfConsistencyEngine:
             answer: The full answer text
 
         Returns:
-            Normalized key answer
+            Normalized key answer: the canonical number and unit when the first
+            sentence is a number with at most one known unit or currency (so
+            "42 km" and "42 kilometers" agree), otherwise the sentence itself
         """
-        # Remove extra whitespace
-        answer = " ".join(answer.split())
-
-        # Try to extract the most important sentence or phrase
-        # Look for common answer patterns
-        sentences = [s.strip() for s in answer.split('.') if s.strip()]
-
-        if not sentences:
-            return answer.lower().strip()
-
-        # Use the first substantive sentence
-        key_answer = sentences[0]
-
-        # Normalize
-        key_answer = key_answer.lower().strip()
-
-        return key_answer
+        # Use the first substantive sentence, found in a single scan
+        match = _FIRST_SENTENCE_RE.search(answer)
+        key_answer = match.group(0) if match else answer
+
+        numeric = _NUMERIC_ANSWER_RE.fullmatch(key_answer)
+        if numeric:
+            units = {
+                _UNIT_NAMES.get(_WHITESPACE_RE.sub(" ", name).casefold())
+                for name in (numeric["currency"], numeric["unit"]) if name
+            }
+            # Unknown units (e.g. "5 apples") keep the text key; so do conflicting ones
+            if None not in units and len(units) <= 1:
+                number = format(Decimal(numeric["number"].replace(",", "")).normalize(), "f")
+                return " ".join([number, *units])
+
+        # Normalize whitespace (most answers are already single-spaced) and case
+        if "  " in key_answer or "\t" in key_answer or "\n" in key_answer or "\r" in key_answer:
+            key_answer = _WHITESPACE_RE.sub(" ", key_answer)
+        return key_answer.strip().casefold()
 
     def calculate_consistency(
         self,
@@ -150,36 +383,39 @@ class SelfConsistencyEngine:
         if not samples:
             return "", 0.0, 0.0, 0.0, "No samples generated"
 
-        # Extract and normalize answers
-        answers = [self.extract_key_answer(s.final_answer) for s in samples]
-
-        # Count occurrences
-        answer_counts = Counter(answers)
+        # A single sample agrees with itself; skip the aggregation
+        if len(samples) == 1:
+            sample = samples[0]
+            summary = self._create_consistency_summary(
+                samples, {sample.final_answer: 1}, sample.llm_confidence, 100.0
+            )
+            return sample.final_answer, sample.llm_confidence / 100.0, sample.llm_confidence, 100.0, summary
+
+        # One pass over the samples: count each normalized answer, total its
+        # LLM confidences and remember the first full answer that produced it
+        answer_counts = Counter()
+        confidence_totals = defaultdict(float)
+        first_answers = {}
+        for s in samples:
+            # Interned so repeated answers share one string and compare by identity
+            key = sys.intern(self.extract_key_answer(s.final_answer))
+            answer_counts[key] += 1
+            confidence_totals[key] += s.llm_confidence
+            first_answers.setdefault(key, s.final_answer)
 
         # Find most common answer
         most_common_answer, count = answer_counts.most_common(1)[0]
+        final_answer = first_answers[most_common_answer]
 
         # Calculate agreement-based confidence (proportion of samples agreeing)
         agreement_confidence = (count / len(samples)) * 100.0  # 0-100 scale for display
 
-        # Calculate average LLM confidence from samples that gave the most common answer
-        llm_confidences = [
-            s.llm_confidence for s in samples
-            if self.extract_key_answer(s.final_answer) == most_common_answer
-        ]
-        avg_llm_confidence = sum(llm_confidences) / len(llm_confidences) if llm_confidences else 50.0
+        # Average LLM confidence over the `count` agreeing samples
+        avg_llm_confidence = confidence_totals[most_common_answer] / count
 
         # Use LLM confidence as primary confidence score (convert to 0-1 scale)
         primary_confidence = avg_llm_confidence / 100.0
 
-        # Find the full answer corresponding to the most common key answer
-        for sample in samples:
-            if self.extract_key_answer(sample.final_answer) == most_common_answer:
-                final_answer = sample.final_answer
-                break
-        else:
-            final_answer = most_common_answer
-
         # Create summary
         summary = self._create_consistency_summary(
             samples, answer_counts, avg_llm_confidence, agreement_confidence
@@ -190,32 +426,42 @@ class SelfConsistencyEngine:
     def _create_consistency_summary(
         self,
         samples: List[SelfConsistencySample],
-        answer_counts: Counter,
+        answer_counts: dict,
         llm_confidence: float,
         agreement_confidence: float
     ) -> str:
         """Create a summary of the self-consistency analysis"""
-
-        summary_parts = [
-            f"Generated {len(samples)} independent reasoning paths.",
-            f"LLM confidence: {llm_confidence:.1f}% (Agreement: {agreement_confidence:.1f}%)",
-        ]
-
         if len(answer_counts) > 1:
-            summary_parts.append(
-                f"Found {len(answer_counts)} distinct answer patterns."
-            )
+            outcome = f"Found {len(answer_counts)} distinct answer patterns."
         else:
-            summary_parts.append("All reasoning paths converged to the same answer.")
+            outcome = "All reasoning paths converged to the same answer."
 
-        return " ".join(summary_parts)
+        return (
+            f"Generated {len(samples)} independent reasoning paths. "
+            f"LLM confidence: {llm_confidence:.1f}% (Agreement: {agreement_confidence:.1f}%) "
+            f"{outcome}"
+        )
 
-    def reflection_call(
+    def _format_reasoning_path(self, sample: SelfConsistencySample) -> str:
+        """Format one sample's reasoning path for the reflection prompt"""
+        steps_text = "".join(
+            f"Step {step.step_number}: {step.reasoning}\nConclusion: {step.intermediate_conclusion}\n"
+            for step in sample.reasoning_path
+        )
+        return (
+            f"\n=== Reasoning Path {sample.sample_number} ===\n"
+            f"{steps_text}"
+            f"Final Answer: {sample.final_answer}\n"
+            f"Confidence: {sample.llm_confidence}%\n"
+        )
+
+    async def areflection_call(
         self,
         prompt: str,
         samples: List[SelfConsistencySample],
         preliminary_answer: str,
-        system_prompt: str = None
+        system_prompt: str = None,
+        reasoning_text: str = None
     ) -> Tuple[str, str, float, dict]:
         """
         Make a final reflection call with all reasoning paths and answers
@@ -225,27 +471,20 @@ class SelfConsistencyEngine:
             samples: All self-consistency samples with CoT reasoning
             preliminary_answer: The preliminary answer from self-consistency
             system_prompt: Optional system prompt to provide context and instructions
+            reasoning_text: Reasoning paths already formatted during sampling (built from samples if omitted)
 
         Returns:
             Tuple of (refined_answer, reflection_reasoning, reflection_confidence, token_usage)
         """
-        print(f"  Inside reflection_call with {len(samples)} samples")
+        logger.debug("Inside areflection_call with %d samples", len(samples))
 
         # Build summary of all reasoning paths
-        reasoning_summary = []
-        for sample in samples:
-            reasoning_summary.append(f"\n=== Reasoning Path {sample.sample_number} ===")
-            for step in sample.reasoning_path:
-                reasoning_summary.append(f"Step {step.step_number}: {step.reasoning}")
-                reasoning_summary.append(f"Conclusion: {step.intermediate_conclusion}")
-            reasoning_summary.append(f"Final Answer: {sample.final_answer}")
-            reasoning_summary.append(f"Confidence: {sample.llm_confidence}%\n")
-
-        reasoning_text = "\n".join(reasoning_summary)
+        if reasoning_text is None:
+            reasoning_text = "\n".join(self._format_reasoning_path(sample) for sample in samples)
 
         # Create reflection prompt with optional system context
         if system_prompt:
-            reflection_prompt = """You are analyzing multiple reasoning paths to produce a refined final answer.
+            reflection_prompt = f"""You are analyzing multiple reasoning paths to produce a refined final answer.
 
 SYSTEM CONTEXT:
 {system_prompt}
@@ -267,7 +506,7 @@ Based on all the reasoning paths above, provide:
 Return ONLY a JSON object in this exact format:
 {{"refined_answer": "your final answer", "reflection_reasoning": "your analysis", "confidence": 85}}"""
         else:
-            reflection_prompt = """You are analyzing multiple reasoning paths to produce a refined final answer.
+            reflection_prompt = f"""You are analyzing multiple reasoning paths to produce a refined final answer.
 
 ORIGINAL QUESTION:
 {prompt}
@@ -291,57 +530,102 @@ Return ONLY a JSON object in this exact format:
             HumanMessage(content=reflection_prompt)
         ]
 
-        print(f"  Calling LLM for reflection...")
-        response = self.cot_engine.llm.invoke(messages)
-        print(f"  LLM response received, length: {len(response.content)}")
-        content = response.content.strip()
-        print(f"  Raw content preview: {content[:200]}")
+        logger.debug("Calling LLM for reflection")
+        structured_llm = self.cot_engine.llm.with_structured_output(ReflectionSchema, include_raw=True)
+        result = await self.cot_engine.call_llm(lambda: structured_llm.ainvoke(messages))
+        response = result["raw"]
+        logger.debug("Reflection LLM response received")
 
         # Track token usage
-        token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-        if hasattr(response, 'usage_metadata') and response.usage_metadata:
-            token_usage["prompt_tokens"] = response.usage_metadata.get("input_tokens", 0)
-            token_usage["completion_tokens"] = response.usage_metadata.get("output_tokens", 0)
-            token_usage["total_tokens"] = response.usage_metadata.get("total_tokens", 0)
-        elif hasattr(response, 'response_metadata') and 'token_usage' in response.response_metadata:
-            usage = response.response_metadata['token_usage']
-            token_usage["prompt_tokens"] = usage.get("prompt_tokens", 0)
-            token_usage["completion_tokens"] = usage.get("completion_tokens", 0)
-            token_usage["total_tokens"] = usage.get("total_tokens", 0)
-
-        # Parse response
-        try:
-            # Extract JSON if wrapped in code blocks
-            if "```json" in content:
-                json_start = content.find("```json") + 7
-                json_end = content.find("```", json_start)
-                content = content[json_start:json_end].strip()
-            elif "```" in content:
-                json_start = content.find("```") + 3
-                json_end = content.find("```", json_start)
-                content = content[json_start:json_end].strip()
-
-            parsed = json.loads(content)
-            refined_answer = parsed.get("refined_answer", preliminary_answer)
-            reflection_reasoning = parsed.get("reflection_reasoning", "Reflection completed")
-            confidence = float(parsed.get("confidence", 50.0))
-            confidence = max(0.0, min(100.0, confidence))
-
-            return refined_answer, reflection_reasoning, confidence, token_usage
-
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
+        token_usage = self.cot_engine.extract_usage(response)
+
+        parsed = result["parsed"]
+        if parsed is None:
             # Fallback: use preliminary answer
-            print(f"Reflection JSON parsing failed: {str(e)}")
-            print(f"Raw content: {content[:200]}")
-            return preliminary_answer, "Reflection parsing failed, using preliminary answer", 50.0, token_usage
+            logger.warning("Reflection structured output parsing failed: %s", result["parsing_error"])
+            return preliminary_answer, REFLECTION_PARSING_FAILED, 50.0, token_usage
 
-    def run_self_consistency(
+        # Ensure confidence is in valid range
+        confidence = max(0.0, min(100.0, parsed.confidence))
+
+        return parsed.refined_answer, parsed.reflection_reasoning, confidence, token_usage
+
+    async def arun_self_consistency(
         self,
         prompt: str,
         num_samples: int,
         num_cot_steps: int,
-        system_prompt: str = None
-    ) -> Tuple[List[SelfConsistencySample], str, str, str, float, float, float, float, str, dict, dict]:
+        system_prompt: str = None,
+        mode: str = "sync",
+        early_stop_threshold: float = None,
+        cache: bool = None
+    ) -> Tuple[List[SelfConsistencySample], str, str, str, float, float, float, float, str, dict, dict, bool]:
+        """
+        Run the self-consistency pipeline, reusing an identical earlier run when cached
+
+        Results are cached for config.RESULT_CACHE_TTL seconds, keyed on every
+        input that affects them. By default only deterministic runs
+        (temperature 0) are cached; cache=True also caches sampled runs and
+        cache=False disables the cache. Other arguments and the return value
+        are the same as _arun_pipeline; a cache hit returns a copy of the
+        stored result with zero token usage and timing marked "cached".
+        """
+        start_time = time.time()
+        if cache is None:
+            cache = self.temperature == 0
+        if not cache:
+            return await self._arun_pipeline(
+                prompt, num_samples, num_cot_steps, system_prompt, mode, early_stop_threshold
+            )
+
+        key = hashlib.sha256(json.dumps({
+            "prompt": prompt,
+            "system_prompt": system_prompt,
+            "num_samples": num_samples,
+            "num_cot_steps": num_cot_steps,
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "mode": mode,
+            "early_stop_threshold": early_stop_threshold
+        }, sort_keys=True).encode()).hexdigest()
+
+        with _result_cache_lock:
+            result = _result_cache.get(key)
+        if result is not None:
+            logger.debug("Result cache hit")
+            # Copied so callers cannot change the stored result; this call spent no tokens
+            timing = {"total_time": round(time.time() - start_time, 3), "unit": "seconds", "cached": True}
+            return (*copy.deepcopy(result[:9]), dict.fromkeys(result[9], 0), timing, result[11])
+
+        result = await self._arun_pipeline(
+            prompt, num_samples, num_cot_steps, system_prompt, mode, early_stop_threshold
+        )
+        if self.is_degraded(result):
+            logger.debug("Not caching a run with failed samples or reflection")
+            return result
+
+        with _result_cache_lock:
+            _result_cache[key] = copy.deepcopy(result)
+        return result
+
+    def is_degraded(self, result: tuple) -> bool:
+        """Whether a pipeline result has no samples, a failed CoT step or a fallback reflection"""
+        samples, reflection_reasoning = result[0], result[3]
+        return (
+            not samples
+            or any(step.is_error for sample in samples for step in sample.reasoning_path)
+            or reflection_reasoning.startswith((REFLECTION_FAILED, REFLECTION_PARSING_FAILED))
+        )
+
+    async def _arun_pipeline(
+        self,
+        prompt: str,
+        num_samples: int,
+        num_cot_steps: int,
+        system_prompt: str = None,
+        mode: str = "sync",
+        early_stop_threshold: float = None
+    ) -> Tuple[List[SelfConsistencySample], str, str, str, float, float, float, float, str, dict, dict, bool]:
         """
         Run complete self-consistency pipeline WITH PARALLEL EXECUTION and REFLECTION
 
@@ -350,56 +634,56 @@ Return ONLY a JSON object in this exact format:
             num_samples: Number of reasoning paths
             num_cot_steps: Number of CoT steps per path
             system_prompt: Optional system prompt to provide context and instructions
+            mode: "sync" for direct LLM calls, "batch" to generate samples through the Batch API
+            early_stop_threshold: Stop sampling once this share (0-1) of completed samples agree
+                or the leading answer can no longer be overtaken; None disables early stopping
 
         Returns:
             Tuple of (samples, preliminary_answer, final_answer, reflection_reasoning,
-                     weighted_confidence, llm_confidence, agreement_confidence, reflection_confidence, summary, token_usage, timing)
+                     weighted_confidence, llm_confidence, agreement_confidence, reflection_confidence, summary, token_usage, timing,
+                     stopped_early)
         """
         start_time = time.time()
 
         # Generate multiple reasoning paths IN PARALLEL
-        try:
-            # Try to get existing event loop
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                # If loop is running, create a new one in a thread (shouldn't happen in Flask)
-                import nest_asyncio
-                nest_asyncio.apply()
-                samples, samples_tokens = loop.run_until_complete(
-                    self.generate_multiple_paths_async(prompt, num_samples, num_cot_steps, system_prompt)
-                )
-            else:
-                samples, samples_tokens = loop.run_until_complete(
-                    self.generate_multiple_paths_async(prompt, num_samples, num_cot_steps, system_prompt)
-                )
-        except RuntimeError:
-            # No event loop exists, create one
-            samples, samples_tokens = asyncio.run(
-                self.generate_multiple_paths_async(prompt, num_samples, num_cot_steps, system_prompt)
-            )
+        samples, samples_tokens, reasoning_text, stopped_early = await self.generate_multiple_paths_async(
+            prompt, num_samples, num_cot_steps, system_prompt, mode, early_stop_threshold
+        )
 
         # Calculate most consistent answer with weighted hybrid confidence
         preliminary_answer, weighted_confidence, llm_confidence, agreement_confidence, summary = self.calculate_consistency(samples)
 
-        # Perform reflection call to get refined final answer
-        print(f"\n=== STARTING REFLECTION CALL ===")
-        print(f"Preliminary answer: {preliminary_answer[:100]}...")
-        try:
-            final_answer, reflection_reasoning, reflection_confidence, reflection_tokens = self.reflection_call(
-                prompt, samples, preliminary_answer, system_prompt
-            )
-            print(f"=== REFLECTION COMPLETED ===")
-            print(f"Final answer: {final_answer[:100]}...")
-            print(f"Reflection confidence: {reflection_confidence}%")
-        except Exception as e:
-            # Fallback if reflection fails completely
-            print(f"!!! Reflection call failed: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        if (
+            config.SKIP_REFLECTION_ON_CONSENSUS
+            and len(samples) > 1
+            and agreement_confidence >= config.CONSENSUS_THRESHOLD
+        ):
+            # Paths agree, so reflection would not change the answer: skip the LLM call
+            logger.debug("Skipping reflection call (agreement %.1f%%)", agreement_confidence)
             final_answer = preliminary_answer
-            reflection_reasoning = f"Reflection failed: {str(e)}"
-            reflection_confidence = 50.0
+            reflection_reasoning = "All paths converged; reflection skipped"
+            reflection_confidence = llm_confidence
             reflection_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        else:
+            # Perform reflection call to get refined final answer
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Starting reflection call, preliminary answer: %s...", preliminary_answer[:100])
+            try:
+                final_answer, reflection_reasoning, reflection_confidence, reflection_tokens = await self.areflection_call(
+                    prompt, samples, preliminary_answer, system_prompt, reasoning_text
+                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Reflection completed, final answer: %s... (confidence %s%%)",
+                        final_answer[:100], reflection_confidence
+                    )
+            except Exception as e:
+                # Fallback if reflection fails completely
+                logger.exception("Reflection call failed: %s", e)
+                final_answer = preliminary_answer
+                reflection_reasoning = f"{REFLECTION_FAILED}{str(e)}"
+                reflection_confidence = 50.0
+                reflection_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
         # Calculate total time
         total_time = time.time() - start_time
@@ -418,4 +702,55 @@ Return ONLY a JSON object in this exact format:
         }
 
         return (samples, preliminary_answer, final_answer, reflection_reasoning,
-                weighted_confidence, llm_confidence, agreement_confidence, reflection_confidence, summary, total_token_usage, timing)
+                weighted_confidence, llm_confidence, agreement_confidence, reflection_confidence, summary, total_token_usage, timing,
+                stopped_early)
+
+    def run_self_consistency(
+        self,
+        prompt: str,
+        num_samples: int,
+        num_cot_steps: int,
+        system_prompt: str = None,
+        mode: str = "sync",
+        early_stop_threshold: float = None,
+        cache: bool = None
+    ) -> Tuple[List[SelfConsistencySample], str, str, str, float, float, float, float, str, dict, dict, bool]:
+        """
+        Synchronous entry point for arun_self_consistency
+
+        The whole pipeline (sampling, consistency and reflection) is submitted
+        to the shared event loop as a single coroutine and this call blocks
+        until it completes. Arguments and return value are the same as
+        arun_self_consistency.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.arun_self_consistency(
+                prompt, num_samples, num_cot_steps, system_prompt, mode, early_stop_threshold, cache
+            ),
+            _event_loop
+        ).result()
+
+    async def run_self_consistency_async(
+        self,
+        prompt: str,
+        num_samples: int,
+        num_cot_steps: int,
+        system_prompt: str = None,
+        mode: str = "sync",
+        early_stop_threshold: float = None,
+        cache: bool = None
+    ) -> Tuple[List[SelfConsistencySample], str, str, str, float, float, float, float, str, dict, dict, bool]:
+        """
+        Awaitable entry point for arun_self_consistency from another event loop
+
+        The engine's semaphore and HTTP clients are bound to the shared event
+        loop, so the pipeline still runs there; the caller's loop awaits the
+        result without blocking. Arguments and return value are the same as
+        arun_self_consistency.
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+            self.arun_self_consistency(
+                prompt, num_samples, num_cot_steps, system_prompt, mode, early_stop_threshold, cache
+            ),
+            _event_loop
+        ))
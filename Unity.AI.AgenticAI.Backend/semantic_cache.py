@@ -0,0 +1,106 @@
+"""
+Semantic response cache for the Agentic AI API
+"""
+import faiss
+import logging
+import numpy as np
+from collections import OrderedDict
+from langchain_openai import OpenAIEmbeddings, AzureOpenAIEmbeddings
+from models import AgenticResponse
+from config import get_config
+from typing import Optional
+
+config = get_config()
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Cache of completed responses keyed by prompt embedding.
+
+    A cached response is reused when a new prompt's embedding has cosine
+    similarity of at least the threshold with a cached prompt AND all other
+    request parameters (system prompt, model, temperature, sample and step
+    counts) are identical. Each parameter set has its own FAISS index.
+    """
+
+    def __init__(self, threshold: float = None, max_entries: int = None):
+        """
+        Initialize the semantic cache
+
+        Args:
+            threshold: Minimum cosine similarity for a hit (defaults to config.SEMANTIC_CACHE_THRESHOLD)
+            max_entries: Maximum cached responses before the oldest is evicted (defaults to config.SEMANTIC_CACHE_SIZE)
+        """
+        self.threshold = threshold if threshold is not None else config.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries or config.SEMANTIC_CACHE_SIZE
+
+        if config.OPENAI_PROVIDER == "azure":
+            self.embeddings = AzureOpenAIEmbeddings(
+                azure_deployment=config.EMBEDDING_MODEL,
+                api_version=config.AZURE_OPENAI_API_VERSION,
+                azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+                api_key=config.AZURE_OPENAI_API_KEY
+            )
+        else:
+            self.embeddings = OpenAIEmbeddings(
+                model=config.EMBEDDING_MODEL,
+                api_key=config.OPENAI_API_KEY
+            )
+
+        # Inner-product index over L2-normalized vectors = cosine similarity
+        self._indexes: dict[tuple, faiss.IndexIDMap] = {}
+        # Entry id -> (params, response), oldest first
+        self._entries: "OrderedDict[int, tuple[tuple, AgenticResponse]]" = OrderedDict()
+        self._next_id = 0
+
+    async def aembed(self, prompt: str) -> Optional[np.ndarray]:
+        """
+        Embed a prompt for lookup and insertion
+
+        Returns:
+            Normalized (1, dim) float32 vector, or None if embedding failed
+        """
+        try:
+            vector = np.array([await self.embeddings.aembed_query(prompt)], dtype=np.float32)
+        except Exception as e:
+            logger.warning("Semantic cache embedding failed, bypassing cache: %s", e)
+            return None
+
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, vector: Optional[np.ndarray], params: tuple) -> Optional[AgenticResponse]:
+        """Return the cached response for the most similar prompt with these params, if similar enough"""
+        index = self._indexes.get(params)
+        if vector is None or index is None or index.ntotal == 0:
+            return None
+
+        similarities, ids = index.search(vector, 1)
+        if ids[0][0] == -1 or similarities[0][0] < self.threshold:
+            return None
+
+        logger.debug("Semantic cache hit (similarity %.3f)", similarities[0][0])
+        return self._entries[int(ids[0][0])][1]
+
+    def add(self, vector: Optional[np.ndarray], params: tuple, response: AgenticResponse) -> None:
+        """Cache a response, evicting the oldest entry when full"""
+        if vector is None:
+            return
+
+        index = self._indexes.get(params)
+        if index is None:
+            index = self._indexes[params] = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+
+        entry_id = self._next_id
+        self._next_id += 1
+        index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+        self._entries[entry_id] = (params, response)
+
+        if len(self._entries) > self.max_entries:
+            old_id, (old_params, _) = self._entries.popitem(last=False)
+            old_index = self._indexes[old_params]
+            old_index.remove_ids(np.array([old_id], dtype=np.int64))
+            if old_index.ntotal == 0:
+                del self._indexes[old_params]
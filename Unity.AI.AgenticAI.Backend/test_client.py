@@ -3,10 +3,17 @@ Test client for the Agentic AI API
 Demonstrates how to use both /v1/completions and /v1/chat/completions endpoints
 """
 
+import asyncio
+import httpx
 import requests
-import json
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any
 
+# Request bodies are encoded with orjson, so the content type is set by hand
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 class AgenticAIClient:
     """Client for interacting with the Agentic AI API"""
@@ -14,6 +21,15 @@ class AgenticAIClient:
     def __init__(self, base_url: str = "http://localhost:5000"):
         self.base_url = base_url
 
+        # One keep-alive session for every call, retrying dropped connections with backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Created on first async call so it binds to the running event loop
+        self._async_client = None
+
     def completions(
         self,
         prompt: str,
@@ -40,45 +56,92 @@ class AgenticAIClient:
             API response as dictionary
         """
         url = f"{self.base_url}/v1/completions"
+        data = _completion_fields(prompt, system_prompt, num_self_consistency, num_cot, model, temperature)
 
         # If PDF file is provided, use multipart/form-data
         if pdf_file_path:
             with open(pdf_file_path, 'rb') as pdf_file:
                 files = {'pdf_file': pdf_file}
-                data = {
-                    'prompt': prompt,
-                    'num_self_consistency': str(num_self_consistency),
-                    'num_cot': str(num_cot),
-                    'model': model,
-                    'temperature': str(temperature)
-                }
-                # Add system_prompt if provided
-                if system_prompt:
-                    data['system_prompt'] = system_prompt
-                response = requests.post(url, files=files, data=data)
+                response = self.session.post(url, files=files, data=_as_form_fields(data))
         else:
             # Regular JSON request
-            data = {
-                "prompt": prompt,
-                "num_self_consistency": num_self_consistency,
-                "num_cot": num_cot,
-                "model": model,
-                "temperature": temperature
-            }
-            # Add system_prompt if provided
-            if system_prompt:
-                data["system_prompt"] = system_prompt
-            response = requests.post(url, json=data)
+            response = self.session.post(url, data=orjson.dumps(data), headers=JSON_HEADERS)
+
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+    async def acompletions(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        num_self_consistency: int = 5,
+        num_cot: int = 3,
+        model: str = "fast",
+        temperature: float = 0.7,
+        pdf_file_path: str = None
+    ) -> Dict[str, Any]:
+        """
+        Call the /v1/completions endpoint without blocking, so independent calls can overlap
+
+        Takes the same arguments as completions().
+        """
+        if self._async_client is None:
+            # Generous read timeout: a full self-consistency run can take minutes
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url, http2=True, timeout=httpx.Timeout(300.0, connect=10.0)
+            )
+
+        data = _completion_fields(prompt, system_prompt, num_self_consistency, num_cot, model, temperature)
+
+        if pdf_file_path:
+            with open(pdf_file_path, 'rb') as pdf_file:
+                files = {'pdf_file': pdf_file.read()}
+            response = await self._async_client.post("/v1/completions", files=files, data=_as_form_fields(data))
+        else:
+            response = await self._async_client.post("/v1/completions", content=orjson.dumps(data), headers=JSON_HEADERS)
 
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
+
+    async def aclose(self):
+        """Close the async HTTP client, if one was opened"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
     def health_check(self) -> Dict[str, Any]:
         """Check if the API is running"""
         url = f"{self.base_url}/"
-        response = requests.get(url)
+        response = self.session.get(url)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
+
+
+def _completion_fields(
+    prompt: str,
+    system_prompt: str,
+    num_self_consistency: int,
+    num_cot: int,
+    model: str,
+    temperature: float
+) -> Dict[str, Any]:
+    """Build the /v1/completions request fields"""
+    data = {
+        "prompt": prompt,
+        "num_self_consistency": num_self_consistency,
+        "num_cot": num_cot,
+        "model": model,
+        "temperature": temperature
+    }
+    # Add system_prompt if provided
+    if system_prompt:
+        data["system_prompt"] = system_prompt
+    return data
+
+
+def _as_form_fields(data: Dict[str, Any]) -> Dict[str, str]:
+    """Convert request fields to multipart/form-data strings"""
+    return {key: str(value) for key, value in data.items()}
 
 
 def print_response(response: Dict[str, Any]):
@@ -171,44 +234,32 @@ def main():
         print(f"✓ API is running: {health['service']}")
     except Exception as e:
         print(f"✗ Error connecting to API: {e}")
-        print("Make sure the server is running with: python app.py")
+        print("Make sure the server is running with: hypercorn --config file:hypercorn_conf.py app:app")
         return
 
-    # # Example 1: Train speed calculation
-    # print("\n\nExample 1: Train speed calculation")
-    # print("-" * 80)
-    # try:
-    #     response = client.completions(
-    #         prompt="If a train travels 60 kilometers in 1 hour, how far will it travel in 2.5 hours?",
-    #         num_self_consistency=3,
-    #         num_cot=1,
-    #         model="fast",
-    #         temperature=0.7
-    #     )
-    #     print_response(response)
-    # except Exception as e:
-    #     print(f"Error: {e}")
-
-    # # Example 2: Logical reasoning
-    # print("\n\nExample 2: Logical reasoning")
-    # print("-" * 80)
-    # try:
-    #     response = client.completions(
-    #         prompt="Imagine an infinitely wide entrance, which is more likely to pass through it, a military tank or a car?",
-    #         num_self_consistency=1,
-    #         num_cot=1,
-    #         model="fast",
-    #         temperature=0.8
-    #     )
-    #     print_response(response)
-    # except Exception as e:
-    #     print(f"Error: {e}")
-
-    # Example 3: PDF Analysis (commented out - uncomment and provide PDF path to test)
-    print("\n\nExample 3: PDF Document Analysis with System Prompt")
-    print("-" * 80)
-    try:
-        response = client.completions(
+    asyncio.run(_run_examples(client))
+
+
+async def _run_examples(client: AgenticAIClient):
+    """Send the example requests concurrently and print the responses in order"""
+
+    examples = [
+        ("Example 1: Train speed calculation", dict(
+            prompt="If a train travels 60 kilometers in 1 hour, how far will it travel in 2.5 hours?",
+            num_self_consistency=3,
+            num_cot=1,
+            model="fast",
+            temperature=0.7
+        )),
+        ("Example 2: Logical reasoning", dict(
+            prompt="Imagine an infinitely wide entrance, which is more likely to pass through it, a military tank or a car?",
+            num_self_consistency=1,
+            num_cot=1,
+            model="fast",
+            temperature=0.8
+        )),
+        # Example 3: PDF Analysis (provide a PDF path to test)
+        ("Example 3: PDF Document Analysis with System Prompt", dict(
             system_prompt="You are a helpful document analysis assistant. Provide clear, structured summaries of documents focusing on key themes and actionable insights.",
             prompt="What are the main topics discussed in this document?",
             num_self_consistency=1,  # Reduced to avoid rate limits
@@ -216,10 +267,24 @@ def main():
             model="fast",
             temperature=0.7,
             pdf_file_path=r"C:\Users\LIHE\Downloads\Get_Started_With_Smallpdf.pdf"  # Replace with actual PDF path
+        )),
+    ]
+
+    try:
+        responses = await asyncio.gather(
+            *(client.acompletions(**kwargs) for _, kwargs in examples),
+            return_exceptions=True
         )
-        print_response(response)
-    except Exception as e:
-        print(f"Error: {e}")
+    finally:
+        await client.aclose()
+
+    for (title, _), response in zip(examples, responses):
+        print(f"\n\n{title}")
+        print("-" * 80)
+        if isinstance(response, Exception):
+            print(f"Error: {response}")
+        else:
+            print_response(response)
 
 
 if __name__ == "__main__":
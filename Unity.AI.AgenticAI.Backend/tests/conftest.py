@@ -0,0 +1,12 @@
+"""
+Shared test setup: make the backend modules importable and give the config
+placeholder credentials so engines can be constructed without a real key
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("OPENAI_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "False")
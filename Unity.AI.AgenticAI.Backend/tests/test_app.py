@@ -0,0 +1,136 @@
+"""
+Tests for the /v1/completions endpoint's use of the semantic cache
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+import app as app_module
+from models import ChainOfThoughtStep, SelfConsistencySample
+
+
+def _result(reflection_reasoning: str = "Paths agree") -> tuple:
+    sample = SelfConsistencySample(
+        sample_number=1,
+        reasoning_path=[ChainOfThoughtStep(step_number=1, reasoning="2 + 2", intermediate_conclusion="4")],
+        final_answer="4",
+        llm_confidence=90.0
+    )
+    tokens = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    return ([sample], "4", "4", reflection_reasoning, 0.9, 90.0, 100.0, 90.0, "summary", tokens, {"total_time": 1.0}, False)
+
+
+@pytest.fixture
+def semantic_cache(monkeypatch):
+    cache = SimpleNamespace(
+        aembed=AsyncMock(return_value="vector"),
+        lookup=MagicMock(return_value=None),
+        add=MagicMock()
+    )
+    monkeypatch.setattr(app_module, "semantic_cache", cache)
+    return cache
+
+
+def _use_engine(monkeypatch, result: tuple, degraded: bool = False):
+    engine = SimpleNamespace(
+        run_self_consistency_async=AsyncMock(return_value=result),
+        is_degraded=MagicMock(return_value=degraded)
+    )
+    monkeypatch.setattr(app_module, "get_sc_engine", lambda *args: engine)
+    return engine
+
+
+def _post(payload: dict, query: str = ""):
+    async def run():
+        client = app_module.app.test_client()
+        return await client.post(f"/v1/completions{query}", json=payload)
+    return asyncio.run(run())
+
+
+def test_sampled_request_skips_semantic_cache(monkeypatch, semantic_cache):
+    _use_engine(monkeypatch, _result())
+
+    response = _post({"prompt": "What is 2 + 2?", "temperature": 0.7})
+
+    assert response.status_code == 200
+    semantic_cache.aembed.assert_not_awaited()
+    semantic_cache.add.assert_not_called()
+
+
+def test_deterministic_request_uses_semantic_cache_keyed_on_mode(monkeypatch, semantic_cache):
+    _use_engine(monkeypatch, _result())
+
+    _post({"prompt": "What is 2 + 2?", "temperature": 0, "mode": "sync"})
+
+    lookup_params = semantic_cache.lookup.call_args.args[1]
+    assert "sync" in lookup_params
+    semantic_cache.add.assert_called_once()
+    assert semantic_cache.add.call_args.args[1] == lookup_params
+
+
+def test_sampled_request_with_cache_flag_uses_semantic_cache(monkeypatch, semantic_cache):
+    _use_engine(monkeypatch, _result())
+
+    _post({"prompt": "What is 2 + 2?", "temperature": 0.7, "cache": True})
+
+    semantic_cache.aembed.assert_awaited_once()
+
+
+def test_degraded_response_is_not_added_to_semantic_cache(monkeypatch, semantic_cache):
+    _use_engine(monkeypatch, _result("Reflection failed: provider down"), degraded=True)
+
+    response = _post({"prompt": "What is 2 + 2?", "temperature": 0})
+
+    assert response.status_code == 200
+    semantic_cache.add.assert_not_called()
+
+
+def test_no_cache_request_skips_semantic_cache(monkeypatch, semantic_cache):
+    _use_engine(monkeypatch, _result())
+
+    _post({"prompt": "What is 2 + 2?", "temperature": 0, "no_cache": True})
+
+    semantic_cache.aembed.assert_not_awaited()
+
+
+def test_missing_samples_alone_do_not_set_stopped_early(monkeypatch, semantic_cache):
+    # One sample back for three requested (e.g. failed batch entries), with nothing cancelled
+    _use_engine(monkeypatch, _result())
+
+    response = _post({"prompt": "What is 2 + 2?", "num_self_consistency": 3})
+
+    body = asyncio.run(response.get_json())
+    assert len(body["self_consistency_samples"]) == 1
+    assert body["stopped_early"] is False
+
+
+def test_semantic_cache_hit_reports_zero_usage_and_cost(monkeypatch, semantic_cache):
+    engine = _use_engine(monkeypatch, _result())
+    _post({"prompt": "What is 2 + 2?", "temperature": 0})
+    semantic_cache.lookup.return_value = semantic_cache.add.call_args.args[2]
+
+    response = _post({"prompt": "What's 2 + 2?", "temperature": 0})
+
+    body = asyncio.run(response.get_json())
+    assert engine.run_self_consistency_async.await_count == 1
+    assert body["prompt"] == "What's 2 + 2?"
+    assert body["final_answer"] == "4"
+    assert body["token_usage"] == {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    assert body["cost_analysis"]["total_cost"] == 0
+    assert body["timing"]["cached"] is True
+
+
+def test_compact_response_drops_default_fields(monkeypatch, semantic_cache):
+    _use_engine(monkeypatch, _result())
+
+    full = asyncio.run(_post({"prompt": "What is 2 + 2?"}).get_json())
+    compact = asyncio.run(_post({"prompt": "What is 2 + 2?"}, "?compact=1").get_json())
+
+    assert full["stopped_early"] is False
+    assert "stopped_early" not in compact
+    assert "pdf_info" not in full and "pdf_info" not in compact
+    assert compact["final_answer"] == full["final_answer"] == "4"
+    assert compact["token_usage"] == full["token_usage"]
+    assert "is_error" not in compact["chain_of_thought"][0]
@@ -0,0 +1,128 @@
+"""
+Tests for the chain-of-thought engine's sample generation
+"""
+import asyncio
+import dataclasses
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from langchain.schema import AIMessage
+
+import cot_engine
+from cot_engine import ChainOfThoughtEngine
+
+
+def _generation(content: str):
+    return SimpleNamespace(message=AIMessage(content=content))
+
+
+def _engine_with_llm(**llm_attrs) -> ChainOfThoughtEngine:
+    engine = ChainOfThoughtEngine("gpt-4o-mini", temperature=0.7)
+    engine.llm = SimpleNamespace(temperature=0.7, **llm_attrs)
+    return engine
+
+
+def test_n_samples_provider_error_is_raised_not_repeated_as_answers():
+    engine = _engine_with_llm(agenerate=AsyncMock(side_effect=RuntimeError("provider down")))
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        asyncio.run(engine.agenerate_n_samples("What is 2 + 2?", num_steps=1, n=5))
+
+
+def test_n_samples_drops_empty_completions():
+    sample = '{"steps": [{"reasoning": "2 + 2", "intermediate_conclusion": "4"}], "final_answer": "4", "confidence": 90}'
+    result = SimpleNamespace(
+        generations=[[_generation(sample), _generation(""), _generation(sample)]],
+        llm_output={"token_usage": {"prompt_tokens": 10, "completion_tokens": 30, "total_tokens": 40}}
+    )
+    engine = _engine_with_llm(agenerate=AsyncMock(return_value=result))
+
+    results, token_usage = asyncio.run(engine.agenerate_n_samples("What is 2 + 2?", num_steps=1, n=3))
+
+    assert [final_answer for _, final_answer, _ in results] == ["4", "4"]
+    assert token_usage == {"prompt_tokens": 10, "completion_tokens": 30, "total_tokens": 40}
+
+
+def test_n_samples_with_no_content_raises():
+    result = SimpleNamespace(generations=[[_generation(""), _generation("  ")]], llm_output={})
+    engine = _engine_with_llm(agenerate=AsyncMock(return_value=result))
+
+    with pytest.raises(ValueError):
+        asyncio.run(engine.agenerate_n_samples("What is 2 + 2?", num_steps=1, n=2))
+
+
+def _batch_client(output_lines: list[str]):
+    """Fake OpenAI client whose batch job completes immediately with these output lines"""
+    batch = SimpleNamespace(id="batch-1", status="completed", output_file_id="file-out")
+    return SimpleNamespace(
+        files=SimpleNamespace(
+            create=AsyncMock(return_value=SimpleNamespace(id="file-in")),
+            content=AsyncMock(return_value=SimpleNamespace(text="\n".join(output_lines)))
+        ),
+        batches=SimpleNamespace(
+            create=AsyncMock(return_value=batch),
+            retrieve=AsyncMock(return_value=batch)
+        )
+    )
+
+
+def _batch_line(sample_num: int, content: str = None, error: dict = None) -> str:
+    record = {"custom_id": f"sample-{sample_num}", "error": error}
+    if content is not None:
+        record["response"] = {"body": {
+            "choices": [{"message": {"content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}
+        }}
+    return json.dumps(record)
+
+
+def test_batch_leaves_out_missing_and_failed_samples():
+    sample = '{"steps": [{"reasoning": "2 + 2", "intermediate_conclusion": "4"}], "final_answer": "4", "confidence": 90}'
+    client = _batch_client([
+        _batch_line(1, sample),
+        _batch_line(2, error={"code": "server_error", "message": "boom"}),
+        # sample 3 missing from the output
+        _batch_line(4, "Five"),
+    ])
+    engine = _engine_with_llm(model_name="gpt-4o-mini", root_async_client=client)
+
+    results, total_tokens = asyncio.run(engine.abatch_cot_and_answer("What is 2 + 2?", num_steps=1, num_samples=4))
+
+    assert [final_answer for _, final_answer, _ in results] == ["4", "Five"]
+    assert total_tokens["total_tokens"] == 60
+
+
+def test_batch_with_no_successful_samples_raises():
+    client = _batch_client([_batch_line(1, error={"code": "server_error", "message": "boom"})])
+    engine = _engine_with_llm(model_name="gpt-4o-mini", root_async_client=client)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(engine.abatch_cot_and_answer("What is 2 + 2?", num_steps=1, num_samples=2))
+
+
+def test_batch_past_max_wait_is_cancelled(monkeypatch):
+    monkeypatch.setattr(cot_engine, "config", dataclasses.replace(cot_engine.config, BATCH_POLL_INTERVAL=0, BATCH_MAX_WAIT=0))
+    client = _batch_client([])
+    client.batches.create.return_value = SimpleNamespace(id="batch-1", status="in_progress", output_file_id=None)
+    client.batches.cancel = AsyncMock()
+    engine = _engine_with_llm(model_name="gpt-4o-mini", root_async_client=client)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(engine.abatch_cot_and_answer("What is 2 + 2?", num_steps=1, num_samples=2))
+
+    client.batches.cancel.assert_awaited_once_with("batch-1")
+
+
+def test_cancelled_independent_step_gets_an_error_step():
+    step = AIMessage(
+        content='{"reasoning": "2 + 2 = 4", "intermediate_conclusion": "4"}',
+        usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+    )
+    engine = _engine_with_llm(ainvoke=AsyncMock(side_effect=[step, asyncio.CancelledError()]))
+
+    steps, tokens = asyncio.run(engine.agenerate_cot_steps("What is 2 + 2?", 2, dependent=False))
+
+    assert [s.is_error for s in steps] == [False, True]
+    assert tokens["total_tokens"] == 15
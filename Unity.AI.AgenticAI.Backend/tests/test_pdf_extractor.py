@@ -0,0 +1,71 @@
+"""
+Tests for PDF text extraction
+"""
+import multiprocessing
+
+import fitz
+import pytest
+
+from pdf_extractor import PARALLEL_PAGE_THRESHOLD, extract_text_from_pdf
+
+
+def _make_pdf(num_pages: int, label: str = "Page body") -> bytes:
+    """Build an in-memory PDF whose pages read '<label> <n>'"""
+    with fitz.open() as doc:
+        for page_num in range(1, num_pages + 1):
+            doc.new_page().insert_text((72, 72), f"{label} {page_num}")
+        return doc.tobytes()
+
+
+def _extract_in_child(pdf_bytes: bytes, results) -> None:
+    try:
+        text, info = extract_text_from_pdf(pdf_bytes)
+        results.put((text, info["num_pages"]))
+    except Exception as e:
+        results.put(e)
+
+
+def test_small_pdf_extracts_every_page_in_order():
+    text, info = extract_text_from_pdf(_make_pdf(3, "Small"))
+
+    assert info["num_pages"] == 3
+    assert text.index("Small 1") < text.index("Small 2") < text.index("Small 3")
+
+
+def test_pdf_over_parallel_threshold_extracts_every_page_in_order():
+    num_pages = PARALLEL_PAGE_THRESHOLD + 4
+
+    text, info = extract_text_from_pdf(_make_pdf(num_pages, "Large"))
+
+    assert info["num_pages"] == num_pages
+    positions = [text.index(f"--- Page {n} ---\nLarge {n}") for n in range(1, num_pages + 1)]
+    assert positions == sorted(positions)
+
+
+def test_pdf_over_parallel_threshold_extracts_inside_daemon_process():
+    # ASGI workers run as daemon processes, which cannot start child processes
+    num_pages = PARALLEL_PAGE_THRESHOLD + 4
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(
+        target=_extract_in_child,
+        args=(_make_pdf(num_pages, "Daemon"), results),
+        daemon=True
+    )
+    worker.start()
+    result = results.get(timeout=60)
+    worker.join(timeout=10)
+
+    if isinstance(result, Exception):
+        pytest.fail(f"Extraction failed in daemon process: {result}")
+    text, extracted_pages = result
+    assert extracted_pages == num_pages
+    assert f"Daemon {num_pages}" in text
+
+
+def test_empty_pdf_raises_value_error():
+    with fitz.open() as doc:
+        doc.new_page()
+        blank = doc.tobytes()
+
+    with pytest.raises(ValueError):
+        extract_text_from_pdf(blank)
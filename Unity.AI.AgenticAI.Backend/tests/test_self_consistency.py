@@ -0,0 +1,351 @@
+"""
+Tests for self-consistency answer aggregation
+"""
+import asyncio
+import dataclasses
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from langchain.schema import AIMessage
+
+from models import ChainOfThoughtStep, ReflectionSchema, SelfConsistencySample
+import self_consistency
+from self_consistency import SelfConsistencyEngine
+
+
+@pytest.fixture
+def engine() -> SelfConsistencyEngine:
+    return SelfConsistencyEngine(model_name="gpt-4o-mini", temperature=0.7)
+
+
+@pytest.fixture
+def set_config(monkeypatch):
+    """Override self_consistency config fields for one test"""
+    def set_fields(**fields):
+        monkeypatch.setattr(self_consistency, "config", dataclasses.replace(self_consistency.config, **fields))
+    return set_fields
+
+
+def _sample(
+    sample_num: int,
+    final_answer: str,
+    llm_confidence: float = 80.0,
+    reasoning: str = "r"
+) -> SelfConsistencySample:
+    return SelfConsistencySample(
+        sample_number=sample_num,
+        reasoning_path=[ChainOfThoughtStep(step_number=1, reasoning=reasoning, intermediate_conclusion="c")],
+        final_answer=final_answer,
+        llm_confidence=llm_confidence
+    )
+
+
+@pytest.mark.parametrize("first, second", [
+    ("42 km", "42 kilometers."),
+    ("150", "150.0"),
+    ("150 KM", "150.0 km"),
+    ("$1,000", "1000 dollars"),
+    ("~12%", "12 per cent"),
+    ("-3.0 °C", "-3 degrees celsius"),
+])
+def test_numeric_answers_with_units_share_a_key(engine, first, second):
+    assert engine.extract_key_answer(first) == engine.extract_key_answer(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("90 minutes", "90 seconds"),
+    ("5 apples", "5 oranges"),
+    ("$5", "5 euros"),
+    ("150", "150 km"),
+])
+def test_numeric_answers_with_different_units_do_not_share_a_key(engine, first, second):
+    assert engine.extract_key_answer(first) != engine.extract_key_answer(second)
+
+
+def test_different_units_do_not_inflate_agreement(engine):
+    samples = [_sample(1, "90 minutes"), _sample(2, "90 seconds"), _sample(3, "90 min")]
+
+    final_answer, _, _, agreement_confidence, summary = engine.calculate_consistency(samples)
+
+    assert final_answer == "90 minutes"
+    assert agreement_confidence == pytest.approx(200.0 / 3)
+    assert "2 distinct answer patterns" in summary
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Option A, in 3 cases", "Option B, in 3 cases"),
+    ("150 km in 2.5 hours", "150 km in 3 hours"),
+    ("The tank, 2 reasons", "The car, 2 reasons"),
+])
+def test_answers_with_incidental_numbers_keep_text_keys(engine, first, second):
+    assert engine.extract_key_answer(first) != engine.extract_key_answer(second)
+
+
+def test_numeric_and_mixed_answers_do_not_share_a_key(engine):
+    assert engine.extract_key_answer("150 km in 2.5 hours") != engine.extract_key_answer("150 kilometers")
+    assert engine.extract_key_answer("150 km in 2.5 hours") == "150 km in 2.5 hours"
+
+
+def test_text_key_uses_first_sentence_with_normalized_case_and_spacing(engine):
+    assert engine.extract_key_answer("  The   CAR.  It is smaller.") == "the car"
+
+
+def test_incidental_numbers_do_not_inflate_agreement(engine):
+    samples = [
+        _sample(1, "Option A, in 3 cases"),
+        _sample(2, "Option B, in 3 cases"),
+        _sample(3, "Option C, in 3 cases"),
+    ]
+
+    final_answer, _, _, agreement_confidence, summary = engine.calculate_consistency(samples)
+
+    assert final_answer == "Option A, in 3 cases"
+    assert agreement_confidence == pytest.approx(100.0 / 3)
+    assert "3 distinct answer patterns" in summary
+
+
+def _stub_reflection_llm(engine: SelfConsistencyEngine) -> AsyncMock:
+    """Replace the engine's LLM with a stub returning a fixed reflection; returns the ainvoke mock"""
+    ainvoke = AsyncMock(return_value={
+        "raw": AIMessage(content="", usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120}),
+        "parsed": ReflectionSchema(refined_answer="4", reflection_reasoning="All paths add 2 and 2", confidence=90),
+        "parsing_error": None
+    })
+    engine.cot_engine.llm = SimpleNamespace(
+        temperature=0.7,
+        with_structured_output=lambda *args, **kwargs: SimpleNamespace(ainvoke=ainvoke)
+    )
+    return ainvoke
+
+
+@pytest.mark.parametrize("system_prompt", [None, "Answer as a math tutor."])
+@pytest.mark.parametrize("preformatted", [False, True])
+def test_reflection_prompt_includes_sampled_reasoning_and_answers(engine, system_prompt, preformatted):
+    ainvoke = _stub_reflection_llm(engine)
+    samples = [
+        _sample(1, "Four", reasoning="Two plus two makes four"),
+        _sample(2, "4", reasoning="Counting up from 2 twice reaches 4"),
+    ]
+    reasoning_text = "\n".join(engine._format_reasoning_path(s) for s in samples) if preformatted else None
+
+    refined_answer, _, confidence, token_usage = asyncio.run(engine.areflection_call(
+        "What is 2 + 2?", samples, "Four", system_prompt, reasoning_text
+    ))
+
+    reflection_prompt = ainvoke.call_args.args[0][-1].content
+    for expected in ("What is 2 + 2?", "Two plus two makes four", "Counting up from 2 twice reaches 4", "Final Answer: 4"):
+        assert expected in reflection_prompt
+    if system_prompt:
+        assert system_prompt in reflection_prompt
+    for placeholder in ("{prompt}", "{reasoning_text}", "{preliminary_answer}", "{system_prompt}"):
+        assert placeholder not in reflection_prompt
+    assert (refined_answer, confidence, token_usage["total_tokens"]) == ("4", 90, 120)
+
+
+def _pipeline_result(samples, reflection_reasoning: str = "Paths agree") -> tuple:
+    tokens = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    return (samples, "4", "4", reflection_reasoning, 0.8, 80.0, 100.0, 90.0, "summary", tokens, {"total_time": 1.0}, False)
+
+
+def _failed_step_sample() -> SelfConsistencySample:
+    return SelfConsistencySample(
+        sample_number=1,
+        reasoning_path=[ChainOfThoughtStep(step_number=1, reasoning="Error", intermediate_conclusion="None", is_error=True)],
+        final_answer="4",
+        llm_confidence=50.0
+    )
+
+
+@pytest.mark.parametrize("label, result", [
+    ("no samples", _pipeline_result([])),
+    ("failed step", _pipeline_result([_failed_step_sample()])),
+    ("reflection error", _pipeline_result([_sample(1, "4")], "Reflection failed: provider down")),
+    ("reflection parse error", _pipeline_result([_sample(1, "4")], "Reflection parsing failed, using preliminary answer")),
+])
+def test_degraded_runs_are_not_result_cached(engine, label, result):
+    engine._arun_pipeline = AsyncMock(return_value=result)
+
+    for _ in range(2):
+        asyncio.run(engine.arun_self_consistency(f"Degraded ({label})", 1, 1, cache=True))
+
+    assert engine._arun_pipeline.await_count == 2
+
+
+def test_healthy_runs_are_result_cached(engine):
+    engine._arun_pipeline = AsyncMock(return_value=_pipeline_result([_sample(1, "4")]))
+
+    first = asyncio.run(engine.arun_self_consistency("Healthy run", 1, 1, cache=True))
+    second = asyncio.run(engine.arun_self_consistency("Healthy run", 1, 1, cache=True))
+
+    assert engine._arun_pipeline.await_count == 1
+    assert second[:9] == first[:9]
+    assert second[11] == first[11]
+
+
+def test_result_cache_hit_is_a_copy_with_no_token_usage(engine):
+    engine._arun_pipeline = AsyncMock(return_value=_pipeline_result([_sample(1, "4")]))
+
+    first = asyncio.run(engine.arun_self_consistency("Cache hit usage", 1, 1, cache=True))
+    first[0][0].final_answer = "changed by the first caller"
+    second = asyncio.run(engine.arun_self_consistency("Cache hit usage", 1, 1, cache=True))
+    second[0][0].final_answer = "changed by the second caller"
+    third = asyncio.run(engine.arun_self_consistency("Cache hit usage", 1, 1, cache=True))
+
+    assert first[9]["total_tokens"] == 2
+    assert second[9] == {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    assert second[10]["cached"] is True and "cached" not in first[10]
+    assert third[0][0].final_answer == "4"
+
+
+def _sample_result(sample_num: int, answer: str) -> tuple:
+    tokens = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    return sample_num, [ChainOfThoughtStep(step_number=1, reasoning="r", intermediate_conclusion="c")], answer, 80.0, tokens
+
+
+def _collect(engine: SelfConsistencyEngine, answers: list, slow_answers: list, early_stop_threshold: float) -> tuple:
+    """
+    Collect samples with the given answers completing at once, followed by samples
+    with slow_answers that complete shortly after; returns (collected result,
+    sample numbers of the slow samples that were cancelled)
+    """
+    async def run():
+        cancelled = []
+
+        async def slow(sample_num, answer):
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(sample_num)
+                raise
+            return _sample_result(sample_num, answer)
+
+        async def fast(sample_num, answer):
+            return _sample_result(sample_num, answer)
+
+        coros = [fast(n, answer) for n, answer in enumerate(answers, 1)]
+        coros += [slow(n, answer) for n, answer in enumerate(slow_answers, len(answers) + 1)]
+        total_tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        collected = await engine._collect_samples(coros, total_tokens, early_stop_threshold)
+        # Let the cancelled tasks run their cancellation handlers
+        await asyncio.sleep(0)
+        return collected, cancelled
+
+    return asyncio.run(run())
+
+
+def test_lopsided_vote_cancels_pending_samples_and_sets_stopped_early(engine):
+    (samples, total_tokens, _, stopped_early), cancelled = _collect(engine, ["4", "4", "4"], ["5", "5"], 1.0)
+
+    assert [s.final_answer for s in samples] == ["4", "4", "4"]
+    assert sorted(cancelled) == [4, 5]
+    assert stopped_early is True
+    assert total_tokens["total_tokens"] == 6
+
+
+def test_dropped_sample_does_not_set_stopped_early(engine):
+    # n=3 request where one completion came back empty and was dropped
+    engine.cot_engine.agenerate_n_samples = AsyncMock(return_value=(
+        [([ChainOfThoughtStep(step_number=1, reasoning="r", intermediate_conclusion="c")], "4", 80.0)] * 2,
+        {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    ))
+
+    samples, _, _, stopped_early = asyncio.run(engine.generate_multiple_paths_async("What is 2 + 2?", 3, 1))
+
+    assert len(samples) == 2
+    assert stopped_early is False
+
+
+def test_batch_timeout_falls_back_to_direct_sampling(engine):
+    engine.cot_engine.abatch_cot_and_answer = AsyncMock(side_effect=TimeoutError("Batch batch-1 did not complete"))
+    engine.cot_engine.agenerate_n_samples = AsyncMock(return_value=(
+        [([ChainOfThoughtStep(step_number=1, reasoning="r", intermediate_conclusion="c")], "4", 80.0)] * 3,
+        {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    ))
+
+    samples, _, _, _ = asyncio.run(engine.generate_multiple_paths_async("What is 2 + 2?", 3, 1, mode="batch"))
+
+    assert [s.final_answer for s in samples] == ["4", "4", "4"]
+    engine.cot_engine.agenerate_n_samples.assert_awaited_once()
+
+
+def test_early_stop_once_leader_cannot_be_overtaken(engine, set_config):
+    set_config(EARLY_STOP_MIN_SAMPLES=3)
+
+    # 2 of 3 in agreement: the last sample cannot overtake, even below the minimum sample count
+    (samples, _, _, stopped_early), cancelled = _collect(engine, ["4", "4"], ["5"], 1.0)
+
+    assert len(samples) == 2
+    assert cancelled == [3]
+    assert stopped_early is True
+
+
+def test_early_stop_once_threshold_share_agrees(engine, set_config):
+    set_config(EARLY_STOP_MIN_SAMPLES=3)
+
+    # 2 of 3 completed agree (67% >= 60%), though the 2 pending samples could still tie
+    (samples, _, _, stopped_early), cancelled = _collect(engine, ["4", "5", "4"], ["5", "5"], 0.6)
+
+    assert [s.final_answer for s in samples] == ["4", "5", "4"]
+    assert sorted(cancelled) == [4, 5]
+    assert stopped_early is True
+
+
+def test_early_stop_threshold_waits_for_min_samples(engine, set_config):
+    set_config(EARLY_STOP_MIN_SAMPLES=3)
+
+    # 1 of 2 agree (50% >= 50%), but only 2 samples are in
+    (samples, _, _, stopped_early), cancelled = _collect(engine, ["4", "5"], ["5"], 0.5)
+
+    assert len(samples) == 3
+    assert cancelled == []
+    assert stopped_early is False
+
+
+def test_without_threshold_all_samples_complete(engine):
+    (samples, total_tokens, _, stopped_early), cancelled = _collect(engine, ["4", "4", "4"], ["5", "5"], None)
+
+    assert len(samples) == 5
+    assert cancelled == []
+    assert stopped_early is False
+    assert total_tokens["total_tokens"] == 10
+
+
+def _run_pipeline_with_samples(engine: SelfConsistencyEngine, answers: list) -> tuple:
+    """Run the pipeline on fixed samples with a stubbed reflection; returns (result, reflection ainvoke mock)"""
+    samples = [_sample(n, answer) for n, answer in enumerate(answers, 1)]
+    tokens = {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+    engine.generate_multiple_paths_async = AsyncMock(return_value=(samples, tokens, "paths", False))
+    ainvoke = _stub_reflection_llm(engine)
+    return asyncio.run(engine._arun_pipeline("What is 2 + 2?", len(answers), 1)), ainvoke
+
+
+def test_reflection_is_skipped_when_all_paths_agree(engine, set_config):
+    set_config(SKIP_REFLECTION_ON_CONSENSUS=True, CONSENSUS_THRESHOLD=100.0)
+
+    result, ainvoke = _run_pipeline_with_samples(engine, ["4", "4.", "4"])
+
+    ainvoke.assert_not_awaited()
+    assert result[2] == "4"
+    assert result[3] == "All paths converged; reflection skipped"
+    assert result[7] == 80.0
+    assert result[9]["total_tokens"] == 20
+
+
+@pytest.mark.parametrize("answers", [["4", "5", "4"], ["4"]])
+def test_reflection_runs_without_consensus_or_with_one_sample(engine, set_config, answers):
+    set_config(SKIP_REFLECTION_ON_CONSENSUS=True, CONSENSUS_THRESHOLD=100.0)
+
+    result, ainvoke = _run_pipeline_with_samples(engine, answers)
+
+    ainvoke.assert_awaited_once()
+    assert result[3] == "All paths add 2 and 2"
+    assert result[9]["total_tokens"] == 140
+
+
+def test_reflection_runs_on_consensus_when_skip_is_disabled(engine, set_config):
+    set_config(SKIP_REFLECTION_ON_CONSENSUS=False)
+
+    _, ainvoke = _run_pipeline_with_samples(engine, ["4", "4", "4"])
+
+    ainvoke.assert_awaited_once()